@@ -0,0 +1,108 @@
+import numpy as np
+from PIL import Image
+
+from task import _color_view, _gray_plane, _spread_gray
+from writer import ImageWriter
+
+# Пакетные версии функций из task.py: пачка изображений одного размера
+# хранится как массив (N, H, W) или (N, H, W, C), и каждая операция
+# выполняется одним векторизованным вызовом NumPy для всей пачки
+
+
+def as_batch(imgs):
+    # Список изображений одного размера склеивается в один массив
+    if isinstance(imgs, np.ndarray):
+        return imgs
+    return np.stack(imgs)
+
+
+def read_batch(paths):
+    paths = list(paths)
+    first = np.asarray(Image.open(paths[0]))
+
+    # Память под всю пачку выделяется один раз, кадры декодируются прямо в неё
+    result = np.empty((len(paths), *first.shape), dtype=first.dtype)
+    result[0] = first
+
+    for i, path in enumerate(paths[1:], start=1):
+        img = np.asarray(Image.open(path))
+        if img.shape != first.shape:
+            raise ValueError(f"{path}: размер {img.shape} не совпадает с {first.shape}")
+        result[i] = img
+
+    return result
+
+
+def save_batch(imgs, paths, max_workers=None, **save_options):
+    # Кадры кодируются параллельно на пуле потоков
+    with ImageWriter(max_workers=max_workers, **save_options) as writer:
+        for img, path in zip(imgs, paths, strict=True):
+            writer.submit(img, path)
+
+
+def batch_crop_image(imgs, x1, y1, x2, y2, copy=True):
+    result = as_batch(imgs)[:, y1:y2, x1:x2]
+    return result.copy() if copy else result
+
+
+def batch_rectangle(imgs, x1, y1, x2, y2, pixel, copy=True):
+    imgs = as_batch(imgs)
+    result = imgs.copy() if copy else imgs
+    pixel = np.array(pixel)
+    target = _color_view(result, pixel, plane_ndim=3)
+
+    # Рамка рисуется сразу на всех кадрах
+    target[:, y1, x1:x2] = pixel
+    target[:, y2 - 1, x1:x2] = pixel
+    target[:, y1:y2, x1] = pixel
+    target[:, y1:y2, x2 - 1] = pixel
+
+    return result
+
+
+def batch_rm_color(imgs, c, copy=True):
+    imgs = as_batch(imgs)
+    result = imgs.copy() if copy else imgs
+
+    if len(result.shape) == 4:
+        result[:, :, :, c] = 0
+
+    return result
+
+
+def batch_rotate(imgs, copy=True):
+    # Поворачиваем в плоскости (H, W), ось пачки не трогаем
+    result = np.rot90(as_batch(imgs), k=-1, axes=(1, 2))
+    return result.copy() if copy else result
+
+
+def batch_flip(imgs, mode, copy=True):
+    imgs = as_batch(imgs)
+
+    if mode == "vertical":
+        result = imgs[:, ::-1]
+    elif mode == "horizontal":
+        result = imgs[:, :, ::-1]
+    else:
+        raise ValueError("mode должен быть 'vertical' или 'horizontal'")
+
+    return result.copy() if copy else result
+
+
+def batch_make_gray(imgs, mode, copy=True, out=None, channels=3):
+    imgs = as_batch(imgs)
+
+    if len(imgs.shape) != 4:
+        # Пачка черно-белых изображений уже серая
+        return imgs.copy() if copy else imgs
+
+    if channels not in (1, 3):
+        raise ValueError("channels должен быть 1 или 3")
+
+    gray = _gray_plane(imgs, mode, out)
+
+    if channels == 1:
+        return gray
+
+    result = np.empty(imgs.shape, dtype=imgs.dtype) if copy else imgs
+    return _spread_gray(gray, imgs, result)
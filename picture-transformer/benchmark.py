@@ -0,0 +1,250 @@
+import argparse
+import json
+import platform
+import tempfile
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import PIL
+
+from colorspace import to_hsv, to_ycbcr
+from resize import FILTERS, resize
+from task import (
+    crop_image,
+    flip,
+    make_gray,
+    read_img,
+    read_region,
+    rectangle,
+    rectangles,
+    rm_color,
+    rotate,
+    save_img,
+)
+
+DEFAULT_SIZES = [256, 1024, 4096, 8192]
+DEFAULT_LAYOUTS = ["gray", "rgb", "rgba"]
+DEFAULT_DTYPES = ["uint8", "float32"]
+
+# Форма изображения по числу каналов: gray - (H, W), rgb/rgba - (H, W, C)
+LAYOUT_CHANNELS = {"gray": None, "rgb": 3, "rgba": 4}
+
+
+def make_gray_legacy(img, mode):
+    # Предыдущая версия make_gray: три float32 канала, clip и np.stack
+    result = img.copy()
+
+    r = result[:, :, 0].astype(np.float32)
+    g = result[:, :, 1].astype(np.float32)
+    b = result[:, :, 2].astype(np.float32)
+
+    if mode == "mean":
+        gray = (r + g + b) / 3
+    elif mode == "max":
+        gray = np.maximum.reduce([r, g, b])
+    else:
+        gray = np.minimum.reduce([r, g, b])
+
+    gray = np.clip(gray, 0, 255).astype(np.uint8)
+    return np.stack([gray, gray, gray], axis=-1)
+
+
+def box_colors(colors, img):
+    # Цвет на рамку с числом каналов изображения
+    return colors[:, : img.shape[2]] if img.ndim == 3 else colors[:, 0]
+
+
+def compute_cases(size):
+    # Операции над массивом: имя -> (функция, нужны ли цветные каналы)
+    q = size // 4
+    rng = np.random.default_rng(size)
+    corners = rng.integers(0, size, (256, 2, 2))
+    boxes = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+    colors = rng.integers(0, 256, (len(boxes), 4))
+    cases = {
+        "crop_image": (lambda img: crop_image(img, q, q, 3 * q, 3 * q), False),
+        "rectangle": (lambda img: rectangle(img, q, q, 3 * q, 3 * q, 255), False),
+        "rectangles_256": (lambda img: rectangles(img, boxes, box_colors(colors, img)), False),
+        "rm_color": (lambda img: rm_color(img, 0), True),
+        "rotate": (rotate, False),
+        "flip_vertical": (lambda img: flip(img, "vertical"), False),
+        "flip_horizontal": (lambda img: flip(img, "horizontal"), False),
+        "make_gray_legacy_mean": (lambda img: make_gray_legacy(img, "mean"), True),
+        "to_hsv": (to_hsv, True),
+        "to_ycbcr": (to_ycbcr, True),
+    }
+    for method in FILTERS:
+        cases[f"resize_half_{method}"] = (
+            lambda img, m=method: resize(img, (size // 2, size // 2), m),
+            False,
+        )
+    for mode in ("mean", "max", "min"):
+        cases[f"make_gray_{mode}"] = (lambda img, m=mode: make_gray(img, m), True)
+        cases[f"make_gray_{mode}_channels1"] = (
+            lambda img, m=mode: make_gray(img, m, channels=1),
+            True,
+        )
+    return cases
+
+
+def io_cases(size, tmp_dir):
+    # Кодирование и декодирование на диске, только для uint8
+    q = size // 4
+    png = tmp_dir / "bench.png"
+    jpg = tmp_dir / "bench.jpg"
+    return {
+        "save_img_png": lambda img: save_img(img, png),
+        "save_img_jpg": lambda img: save_img(img, jpg),
+        "read_img_jpg": lambda img: read_img(jpg),
+        "read_region_jpg": lambda img: read_region(jpg, q, q, 3 * q, 3 * q),
+        "read_region_jpg_scale4": lambda img: read_region(
+            jpg, q, q, 3 * q, 3 * q, scale=4
+        ),
+    }
+
+
+def make_image(size, layout, dtype, rng):
+    channels = LAYOUT_CHANNELS[layout]
+    shape = (size, size) if channels is None else (size, size, channels)
+    if np.issubdtype(dtype, np.integer):
+        return rng.integers(0, np.iinfo(dtype).max, shape, dtype=dtype, endpoint=True)
+    return (rng.random(shape, dtype=np.float32) * 255).astype(dtype)
+
+
+def measure(func, img, min_time):
+    # Подбираем число вызовов так, чтобы один замер длился не меньше min_time
+    timer = timeit.Timer(lambda: func(img))
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    seconds = min(timer.repeat(repeat=3, number=number)) / number
+
+    # Пик памяти меряем отдельным вызовом: tracemalloc замедляет работу
+    tracemalloc.start()
+    func(img)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def run(sizes, layouts, dtypes, with_io=True, min_time=0.2, ops=None):
+    rng = np.random.default_rng(0)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+
+        for size in sizes:
+            for layout in layouts:
+                for dtype_name in dtypes:
+                    dtype = np.dtype(dtype_name)
+                    img = make_image(size, layout, dtype, rng)
+
+                    cases = {
+                        name: func
+                        for name, (func, needs_color) in compute_cases(size).items()
+                        if not (needs_color and layout == "gray")
+                    }
+                    if with_io and dtype == np.uint8 and layout != "rgba":
+                        # JPEG не поддерживает альфа-канал
+                        save_img(img, tmp_dir / "bench.jpg")
+                        cases.update(io_cases(size, tmp_dir))
+
+                    for name, func in cases.items():
+                        if ops and name not in ops:
+                            continue
+
+                        seconds, peak = measure(func, img, min_time)
+                        result = {
+                            "op": name,
+                            "size": size,
+                            "layout": layout,
+                            "dtype": dtype_name,
+                            "seconds": seconds,
+                            "mpix_per_s": size * size / 1e6 / seconds,
+                            "peak_bytes": peak,
+                        }
+                        results.append(result)
+                        print(
+                            f"{name:<28} {size:>5}² {layout:<4} {dtype_name:<8} "
+                            f"{seconds * 1000:10.3f} мс {result['mpix_per_s']:10.1f} "
+                            f"Мп/с {peak / 2**20:9.1f} МБ"
+                        )
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+def result_key(result):
+    return result["op"], result["size"], result["layout"], result["dtype"]
+
+
+def compare(baseline, current, threshold):
+    # Сравнивает два отчёта и возвращает замеры, замедлившиеся больше threshold
+    old = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+
+    print(f"\nСравнение с базой (порог {threshold:.0%}):")
+    for result in current["results"]:
+        key = result_key(result)
+        if key not in old:
+            continue
+
+        ratio = result["seconds"] / old[key]["seconds"]
+        memory_ratio = result["peak_bytes"] / max(old[key]["peak_bytes"], 1)
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  <-- регрессия"
+            regressions.append((key, ratio))
+        print(
+            f"{' '.join(map(str, key)):<45} время x{ratio:5.2f} "
+            f"память x{memory_ratio:5.2f}{mark}"
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк операций picture-transformer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--layouts", nargs="+", choices=DEFAULT_LAYOUTS, default=DEFAULT_LAYOUTS
+    )
+    parser.add_argument("--dtypes", nargs="+", default=DEFAULT_DTYPES)
+    parser.add_argument("--ops", nargs="+", default=None, help="только эти операции")
+    parser.add_argument("--no-io", action="store_true", help="без чтения и записи")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output", type=Path, help="куда сохранить JSON отчёт")
+    parser.add_argument("--compare", type=Path, help="JSON отчёт для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.sizes, args.layouts, args.dtypes, not args.no_io, args.min_time, args.ops
+    )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if compare(baseline, report, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+HASH_CHUNK = 1 << 20
+
+
+def _json_default(value):
+    # Параметры операций могут содержать numpy массивы (например pixel)
+    return np.asarray(value).tolist()
+
+
+class ResultCache:
+    # Кэш результатов цепочек операций. Ключ - хэш содержимого исходника,
+    # последовательность операций и их параметры. Первый уровень - LRU в
+    # памяти, второй - .npy файлы на диске; оба ограничены по размеру в байтах.
+    # Возвращаемые массивы доступны только для чтения: их делят все вызовы
+
+    def __init__(
+        self, cache_dir=None, max_memory_bytes=256 << 20, max_disk_bytes=2 << 30
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # (путь, mtime, размер) -> хэш, чтобы не перечитывать неизменные файлы
+        self._source_hashes = {}
+        self._lock = threading.Lock()
+
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def source_hash(self, source):
+        if isinstance(source, np.ndarray):
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(f"{source.shape}{source.dtype}".encode())
+            digest.update(np.ascontiguousarray(source).data)
+            return digest.hexdigest()
+
+        path = Path(source)
+        stat = path.stat()
+        stamp = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        if stamp in self._source_hashes:
+            return self._source_hashes[stamp]
+
+        # Хэшируем байты файла, декодирование не нужно
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK):
+                digest.update(chunk)
+
+        self._source_hashes[stamp] = digest.hexdigest()
+        return self._source_hashes[stamp]
+
+    def key(self, source, ops):
+        ops_spec = json.dumps(ops, sort_keys=True, default=_json_default)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.source_hash(source).encode())
+        digest.update(ops_spec.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._disk_path(key)
+        if path is not None and path.exists():
+            result = np.load(path)
+            # Обновляем время доступа для LRU вытеснения на диске
+            os.utime(path)
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            self._put_memory(key, result)
+            return result
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, result):
+        result = np.array(result)
+        self._put_memory(key, result)
+
+        path = self._disk_path(key)
+        if path is not None:
+            # Пишем во временный файл и переименовываем, чтобы не оставлять
+            # недописанных записей
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, result)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+        return result
+
+    def get_or_compute(self, source, ops, compute):
+        key = self.key(source, ops)
+        result = self.get(key)
+        if result is None:
+            result = self.put(key, compute())
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob("*.npy"):
+                path.unlink(missing_ok=True)
+
+    def _disk_path(self, key):
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{key}.npy"
+
+    def _put_memory(self, key, result):
+        result.setflags(write=False)
+        if result.nbytes > self.max_memory_bytes:
+            return
+
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key).nbytes
+            self._memory[key] = result
+            self._memory_bytes += result.nbytes
+
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+                self.stats["evictions"] += 1
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # Удаляем самые давно использованные файлы, пока не уложимся в лимит
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
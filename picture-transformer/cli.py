@@ -0,0 +1,153 @@
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from pipeline import Pipeline
+from task import IMAGE_EXTENSIONS
+
+# Имя операции в командной строке -> (метод Pipeline, имена параметров)
+OPS = {
+    "crop": ("crop_image", ("x1", "y1", "x2", "y2")),
+    "rotate": ("rotate", ()),
+    "flip": ("flip", ("mode",)),
+    "gray": ("make_gray", ("mode",)),
+    "rm_color": ("rm_color", ("c",)),
+    "rectangle": ("rectangle", ("x1", "y1", "x2", "y2", "r", "g", "b")),
+}
+
+# Допустимые значения параметров: ошибка видна сразу при разборе
+# аргументов, а не в каждом воркере на каждом файле
+CHOICES = {
+    ("flip", "mode"): ("vertical", "horizontal"),
+    ("gray", "mode"): ("mean", "max", "min"),
+    ("rm_color", "c"): ("0", "1", "2"),
+}
+
+
+def parse_op(spec):
+    # Формат: имя[:арг1,арг2,...], например crop:10,20,300,400 или flip:vertical
+    name, _, args = spec.partition(":")
+    if name not in OPS:
+        raise argparse.ArgumentTypeError(
+            f"неизвестная операция '{name}', доступны: {', '.join(OPS)}"
+        )
+
+    method, param_names = OPS[name]
+    values = args.split(",") if args else []
+    if len(values) != len(param_names):
+        raise argparse.ArgumentTypeError(
+            f"операция '{name}' ожидает параметры: {', '.join(param_names) or 'нет'}"
+        )
+
+    params = {}
+    for param, value in zip(param_names, values):
+        choices = CHOICES.get((name, param))
+        if choices is not None and value not in choices:
+            raise argparse.ArgumentTypeError(
+                f"операция '{name}': {param} должен быть одним из {', '.join(choices)}"
+            )
+        if param == "mode":
+            params[param] = value
+            continue
+        try:
+            params[param] = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"операция '{name}': {param} должен быть целым числом, получено '{value}'"
+            ) from None
+
+    if method == "rectangle":
+        params["pixel"] = [params.pop("r"), params.pop("g"), params.pop("b")]
+
+    return method, params
+
+
+def transform_file(src, dst, ops):
+    # Выполняется в процессе-воркере: декодирование, операции и кодирование
+    pipeline = Pipeline(src)
+    for method, params in ops:
+        getattr(pipeline, method)(**params)
+    pipeline.save_img(dst)
+    return dst
+
+
+def iter_images(input_dir):
+    # os.scandir не строит список всех файлов каталога заранее
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS:
+                yield Path(entry.path)
+
+
+def run(input_dir, output_dir, ops, workers=None, max_in_flight=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    # Ограничиваем число задач в полёте, чтобы память не росла с размером каталога
+    max_in_flight = max_in_flight or workers * 4
+
+    done_count = 0
+    failed = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def collect(done):
+            nonlocal done_count
+            for future in done:
+                src = pending.pop(future)
+                try:
+                    future.result()
+                    done_count += 1
+                except Exception as e:
+                    failed.append((src, e))
+
+        for src in iter_images(input_dir):
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            future = executor.submit(transform_file, src, output_dir / src.name, ops)
+            pending[future] = src
+
+        collect(wait(pending).done)
+
+    return done_count, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="picture-transformer",
+        description="Применяет цепочку операций ко всем изображениям каталога",
+    )
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument(
+        "--op",
+        dest="ops",
+        type=parse_op,
+        action="append",
+        required=True,
+        help="операция: crop:x1,y1,x2,y2 | rotate | flip:vertical|horizontal | "
+        "gray:mean|max|min | rm_color:c | rectangle:x1,y1,x2,y2,r,g,b "
+        "(можно указать несколько раз)",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    done_count, failed = run(
+        args.input_dir, args.output_dir, args.ops, args.workers, args.max_in_flight
+    )
+
+    for src, error in failed:
+        print(f"Ошибка {src}: {error}")
+    print(f"Обработано: {done_count}, ошибок: {len(failed)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Преобразования цветовых пространств над (..., C) массивами: работают и с
+# одиночными изображениями, и с пачками, а каналы после RGB (альфа)
+# переносятся в результат без изменений. Тип результата совпадает с исходным:
+# для целых типов каналы растягиваются на весь диапазон типа (как в PIL),
+# float изображения считаются заданными в диапазоне 0..255, как и в task.py
+
+# Матрица и смещения JPEG YCbCr (ITU-R BT.601, полный диапазон)
+YCBCR_MATRIX = np.array(
+    [
+        [0.299, 0.587, 0.114],
+        [-0.168736, -0.331264, 0.5],
+        [0.5, -0.418688, -0.081312],
+    ],
+    dtype=np.float32,
+)
+
+
+def _channel_max(dtype):
+    if np.issubdtype(dtype, np.integer):
+        return np.iinfo(dtype).max
+    return 255.0
+
+
+def _finish(channels, img):
+    # Собирает результат в типе исходника и возвращает альфа-канал на место
+    result = np.empty(img.shape, dtype=img.dtype)
+
+    if np.issubdtype(img.dtype, np.integer):
+        info = np.iinfo(img.dtype)
+        for c, values in enumerate(channels):
+            np.rint(values, out=values)
+            np.clip(values, info.min, info.max, out=values)
+            result[..., c] = values
+    else:
+        for c, values in enumerate(channels):
+            result[..., c] = values
+
+    if img.shape[-1] > 3:
+        result[..., 3:] = img[..., 3:]
+    return result
+
+
+def to_ycbcr(img):
+    if img.shape[-1] < 3:
+        raise ValueError("нужно изображение с каналами R, G, B")
+
+    offset = (_channel_max(img.dtype) + 1) / 2
+    rgb = img[..., :3]
+
+    channels = []
+    for row, shift in zip(YCBCR_MATRIX, (0.0, offset, offset)):
+        # Каждый выходной канал - взвешенная сумма R, G, B без промежуточной
+        # матрицы (H, W, 3) во float
+        values = np.multiply(rgb[..., 0], row[0], dtype=np.float32)
+        values += rgb[..., 1] * row[1]
+        values += rgb[..., 2] * row[2]
+        values += shift
+        channels.append(values)
+
+    return _finish(channels, img)
+
+
+def to_hsv(img):
+    # H, S и V растягиваются на диапазон типа; для float H - в градусах
+    # [0, 360), S - в [0, 1], V - в единицах исходника
+    if img.shape[-1] < 3:
+        raise ValueError("нужно изображение с каналами R, G, B")
+
+    r = img[..., 0].astype(np.float32)
+    g = img[..., 1].astype(np.float32)
+    b = img[..., 2].astype(np.float32)
+
+    v = np.maximum(np.maximum(r, g), b)
+    delta = v - np.minimum(np.minimum(r, g), b)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(v > 0, delta / v, 0.0).astype(np.float32)
+        # Положение оттенка внутри сектора в зависимости от старшего канала
+        h = np.where(
+            r == v,
+            (g - b) / delta,
+            np.where(g == v, 2.0 + (b - r) / delta, 4.0 + (r - g) / delta),
+        )
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0).astype(np.float32)
+
+    if np.issubdtype(img.dtype, np.integer):
+        scale = np.float32(_channel_max(img.dtype))
+        h *= scale
+        s *= scale
+    else:
+        h *= 360.0
+
+    return _finish([h, s, v], img)
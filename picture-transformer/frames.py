@@ -0,0 +1,119 @@
+import re
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from pipeline import GEOMETRIC_OPS, PIXEL_OPS
+from task import IMAGE_EXTENSIONS
+from writer import ImageWriter
+
+# Потоковая обработка последовательности кадров: кадры читаются по одному,
+# проходят цепочку операций в заранее выделенных буферах и сразу пишутся,
+# поэтому память не зависит от длины последовательности
+
+
+def _frame_number(path):
+    numbers = re.findall(r"\d+", path.stem)
+    return (int(numbers[-1]) if numbers else -1, path.name)
+
+
+def iter_frames(source):
+    # source - каталог с пронумерованными кадрами или .npy стек (N, H, W[, C])
+    source = Path(source)
+
+    if source.suffix == ".npy":
+        # Стек отображается в память, кадры отдаются как view без копирования
+        stack = np.load(source, mmap_mode="r")
+        yield from stack
+        return
+
+    paths = [
+        path
+        for path in source.iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    for path in sorted(paths, key=_frame_number):
+        with Image.open(path) as im:
+            yield np.asarray(im)
+
+
+def _buffer(buffers, step, shape, dtype):
+    # Буфер шага выделяется один раз и пересоздаётся только при смене размера
+    buf = buffers.get(step)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype=dtype)
+        buffers[step] = buf
+    return buf
+
+
+def transform_frames(frames, ops):
+    # ops - список (имя, параметры) как в Pipeline.ops, или сам Pipeline.
+    # Возвращаемый кадр - общий выходной буфер: он перезаписывается на
+    # следующей итерации, поэтому его нужно сохранить или скопировать сразу
+    ops = getattr(ops, "ops", ops)
+    buffers = {}
+
+    for frame in frames:
+        img = frame
+        for step, (name, params) in enumerate(ops):
+            if name in GEOMETRIC_OPS:
+                img = GEOMETRIC_OPS[name](img, **params, copy=False)
+            elif name == "make_gray" and len(img.shape) == 3:
+                # Серый канал пишется в буфер, три канала - view над ним
+                gray = _buffer(buffers, step, img.shape[:2], img.dtype)
+                img = PIXEL_OPS[name](img, **params, out=gray, broadcast=True)
+            elif name in PIXEL_OPS:
+                work = _buffer(buffers, step, img.shape, img.dtype)
+                np.copyto(work, img)
+                img = PIXEL_OPS[name](work, **params, copy=False)
+            else:
+                raise ValueError(f"неизвестная операция '{name}'")
+
+        out = _buffer(buffers, "out", img.shape, img.dtype)
+        np.copyto(out, img)
+        yield out
+
+
+def write_frames(frames, output_dir, pattern="frame_{:06d}.png", **save_options):
+    # Кадры кодируются на пуле потоков; очередь ImageWriter ограничена,
+    # поэтому в памяти одновременно держится лишь несколько кадров
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+    with ImageWriter(**save_options) as writer:
+        # transform_frames переиспользует свой буфер, поэтому кадр копируется
+        # в один из max_pending буферов по кругу вместо новой копии на кадр.
+        # Перед перезаписью буфера ждём запись кадра, который в нём лежал
+        buffers = {}
+        pending = [None] * writer.max_pending
+        for i, frame in enumerate(frames):
+            slot = i % writer.max_pending
+            if pending[slot] is not None:
+                pending[slot].result()
+            buf = _buffer(buffers, slot, frame.shape, frame.dtype)
+            np.copyto(buf, frame)
+            pending[slot] = writer.submit(buf, output_dir / pattern.format(i))
+            count += 1
+
+    return count
+
+
+def write_npy_stack(frames, path, count):
+    # Кадры пишутся прямо в .npy файл, отображённый в память
+    out = None
+    written = 0
+
+    for i, frame in enumerate(frames):
+        if out is None:
+            out = np.lib.format.open_memmap(
+                path, mode="w+", dtype=frame.dtype, shape=(count, *frame.shape)
+            )
+        out[i] = frame
+        written += 1
+
+    if out is not None:
+        out.flush()
+
+    return written
@@ -0,0 +1,91 @@
+import numpy as np
+
+from task import (
+    crop_image,
+    flip,
+    make_gray,
+    read_img,
+    rectangle,
+    rm_color,
+    rotate,
+    save_img,
+)
+
+# Геометрические операции возвращают view (copy=False), поэтому цепочка
+# из них схлопывается в один strided view над исходным массивом
+GEOMETRIC_OPS = {
+    "crop_image": crop_image,
+    "rotate": rotate,
+    "flip": flip,
+}
+
+# Попиксельные операции работают in-place (copy=False) над единственной копией
+PIXEL_OPS = {
+    "rectangle": rectangle,
+    "rm_color": rm_color,
+    "make_gray": make_gray,
+}
+
+
+class Pipeline:
+    def __init__(self, source):
+        # source - путь к файлу или numpy массив, чтение откладывается до run()
+        self.source = source
+        self.ops = []
+
+    def _add(self, name, **params):
+        self.ops.append((name, params))
+        return self
+
+    def crop_image(self, x1, y1, x2, y2):
+        return self._add("crop_image", x1=x1, y1=y1, x2=x2, y2=y2)
+
+    def rotate(self):
+        return self._add("rotate")
+
+    def flip(self, mode):
+        if mode not in ("vertical", "horizontal"):
+            raise ValueError("mode должен быть 'vertical' или 'horizontal'")
+        return self._add("flip", mode=mode)
+
+    def rectangle(self, x1, y1, x2, y2, pixel):
+        return self._add("rectangle", x1=x1, y1=y1, x2=x2, y2=y2, pixel=pixel)
+
+    def rm_color(self, c):
+        return self._add("rm_color", c=c)
+
+    def make_gray(self, mode):
+        if mode not in ("mean", "max", "min"):
+            raise ValueError("mode должен быть 'mean', 'max' или 'min'")
+        return self._add("make_gray", mode=mode)
+
+    def run(self, cache=None):
+        # С кэшем (ResultCache) повторные цепочки над тем же исходником
+        # отдаются без декодирования и вычислений
+        if cache is not None:
+            return cache.get_or_compute(self.source, self.ops, self._execute)
+        return self._execute()
+
+    def _execute(self):
+        if isinstance(self.source, np.ndarray):
+            img = self.source
+        else:
+            img = read_img(self.source)
+
+        # Исходный массив не трогаем: копия делается один раз,
+        # перед первой попиксельной операцией
+        owned = False
+
+        for name, params in self.ops:
+            if name in GEOMETRIC_OPS:
+                img = GEOMETRIC_OPS[name](img, **params, copy=False)
+            else:
+                if not owned:
+                    img = img.copy()
+                    owned = True
+                img = PIXEL_OPS[name](img, **params, copy=False)
+
+        return img
+
+    def save_img(self, path, cache=None, **save_options):
+        save_img(self.run(cache), path, **save_options)
@@ -1,42 +1,275 @@
+from pathlib import Path
+
 import numpy as np
 from PIL import Image
 
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Сколько значений смешивать за раз при заливке с alpha < 1: float32 копия
+# полосы строк остаётся в пределах нескольких МБ при любом размере рамки
+BLEND_ELEMENTS = 1 << 20
+
 
 def read_img(path):
+    # .npy хранит массив любого типа и формы без перекодирования
+    if Path(path).suffix.lower() == ".npy":
+        return np.load(path)
     return np.array(Image.open(path))
 
 
-def save_img(img_array, path):
-    Image.fromarray(img_array.astype(np.uint8)).save(path)
+def read_region(path, x1, y1, x2, y2, scale=1):
+    # Читает только область [y1:y2, x1:x2] (в координатах исходного
+    # изображения), уменьшенную в scale раз
+    if scale < 1:
+        raise ValueError("scale должен быть не меньше 1")
+
+    with Image.open(path) as im:
+        width = im.width
+
+        if scale > 1:
+            # Для JPEG draft уменьшает изображение в 2, 4 или 8 раз прямо
+            # при декодировании DCT, полный размер не декодируется вообще
+            im.draft(im.mode, (im.width // scale, im.height // scale))
+
+        # draft может уменьшить меньше запрошенного (или не уменьшить вовсе)
+        draft_scale = round(width / im.width)
+        box = (x1 / draft_scale, y1 / draft_scale, x2 / draft_scale, y2 / draft_scale)
+        size = ((x2 - x1) // scale, (y2 - y1) // scale)
+
+        if draft_scale == scale and all(v.is_integer() for v in box):
+            region = im.crop(tuple(int(v) for v in box))
+        else:
+            # Оставшееся уменьшение делаем усреднением только по нужной области
+            region = im.resize(size, Image.Resampling.BOX, box=box)
+
+        return np.array(region)
+
+
+def save_img(
+    img_array, path, quality=None, optimize=False, progressive=False, compress_level=None
+):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".npy":
+        np.save(path, img_array)
+        return
+
+    # Приводим тип только если формат его не поддерживает,
+    # иначе astype делает лишнюю копию и теряет точность
+    if not _pil_supports(img_array, suffix):
+        img_array = _to_uint8(img_array)
+
+    if suffix in (".jpg", ".jpeg") and len(img_array.shape) == 3:
+        # JPEG не хранит альфа-канал
+        img_array = img_array[:, :, :3]
+
+    # Параметры кодека: скорость против размера файла
+    params = {}
+    if suffix in (".jpg", ".jpeg"):
+        if quality is not None:
+            params["quality"] = quality
+        params["optimize"] = optimize
+        params["progressive"] = progressive
+    elif suffix == ".png":
+        if compress_level is not None:
+            params["compress_level"] = compress_level
+        params["optimize"] = optimize
+
+    Image.fromarray(img_array).save(path, **params)
+
+
+def _pil_supports(img, suffix):
+    if img.dtype == np.uint8:
+        return True
+    # Многоканальные 16-битные и float изображения PIL не сохраняет,
+    # одноканальные - только в PNG/TIFF (I;16) и TIFF (F)
+    if len(img.shape) != 2:
+        return False
+    if img.dtype == np.uint16:
+        return suffix in (".png", ".tif", ".tiff")
+    if img.dtype == np.float32:
+        return suffix in (".tif", ".tiff")
+    return False
 
 
-def crop_image(img, x1, y1, x2, y2):
-    result = img.copy()
+def _to_uint8(img):
+    if img.dtype == np.uint16:
+        # Старший байт вместо отбрасывания старших разрядов
+        return (img >> 8).astype(np.uint8)
+    if np.issubdtype(img.dtype, np.floating):
+        return np.clip(img, 0, 255).astype(np.uint8)
+    return img.astype(np.uint8)
+
+
+def _color_view(img, pixel, plane_ndim=2):
+    # Если цвет задан без альфы (3 значения для RGBA), рисуем только по
+    # цветовым каналам, а альфа-канал оставляем как есть. plane_ndim - число
+    # осей без каналов: 2 для (H, W[, C]), 3 для пачки (N, H, W[, C])
+    pixel = np.asarray(pixel)
+    if img.ndim == plane_ndim + 1 and pixel.ndim and pixel.shape[-1] < img.shape[-1]:
+        return img[..., : pixel.shape[-1]]
+    return img
+
+
+def crop_image(img, x1, y1, x2, y2, copy=True):
     # Обрезаем: сначала строки (y), потом столбцы (x)
-    return result[y1:y2, x1:x2]
+    result = img[y1:y2, x1:x2]
+
+    # copy=False возвращает view без выделения памяти,
+    # иначе копируем только вырезанную область, а не всё изображение
+    return result.copy() if copy else result
 
 
-def rectangle(img, x1, y1, x2, y2, pixel):
-    result = img.copy()
+def rectangle(img, x1, y1, x2, y2, pixel, copy=True):
+    # copy=False рисует прямо в исходном массиве
+    result = img.copy() if copy else img
     pixel = np.array(pixel)
+    target = _color_view(result, pixel)
 
     # Верхняя граница (y1 от x1 до x2)
-    result[y1, x1:x2] = pixel
+    target[y1, x1:x2] = pixel
 
     # Нижняя граница (y2-1 от x1 до x2)
-    result[y2 - 1, x1:x2] = pixel
+    target[y2 - 1, x1:x2] = pixel
 
     # Левая граница (от y1 до y2 по x1)
-    result[y1:y2, x1] = pixel
+    target[y1:y2, x1] = pixel
 
     # Правая граница (от y1 до y2 по x2-1)
-    result[y1:y2, x2 - 1] = pixel
+    target[y1:y2, x2 - 1] = pixel
+
+    return result
+
+
+def _rect_pixels(r0, r1, c0, c1):
+    # Координаты всех пикселей набора прямоугольников [r0:r1, c0:c1]
+    # без цикла по прямоугольникам
+    heights = np.maximum(r1 - r0, 0)
+    widths = np.maximum(c1 - c0, 0)
+    counts = heights * widths
+
+    ids = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    offsets = np.arange(counts.sum()) - starts[ids]
+
+    rows = r0[ids] + offsets // widths[ids]
+    cols = c0[ids] + offsets % widths[ids]
+    return rows, cols, ids
+
+
+def _clip_boxes(shape, boxes):
+    # Обрезаем рамки (N, 4) по границам, чтобы отрицательные индексы не
+    # заворачивались
+    boxes = np.asarray(boxes, dtype=np.intp).reshape(-1, 4)
+    height, width = shape[:2]
+
+    x1 = np.clip(boxes[:, 0], 0, width)
+    y1 = np.clip(boxes[:, 1], 0, height)
+    x2 = np.clip(boxes[:, 2], 0, width)
+    y2 = np.clip(boxes[:, 3], 0, height)
+    return x1, y1, x2, y2
+
+
+def box_indices(shape, boxes, thickness=1, fill=False):
+    # Индексы пикселей для массива рамок (N, 4) в формате x1, y1, x2, y2.
+    # Результат можно посчитать один раз и переиспользовать для многих кадров.
+    # С fill=True массивы занимают по 8 байт на каждый закрашенный пиксель,
+    # поэтому rectangles заливает рамки срезами, если indices не передан
+    x1, y1, x2, y2 = _clip_boxes(shape, boxes)
+
+    if fill:
+        return _rect_pixels(y1, y2, x1, x2)
 
+    t = thickness
+    # Четыре полосы на рамку: верх, низ, лево, право (без углов).
+    # Полосы идут подряд по рамкам, чтобы поздние рамки перекрывали ранние
+    r0 = np.stack([y1, np.maximum(y2 - t, y1), y1 + t, y1 + t], axis=1).ravel()
+    r1 = np.stack([np.minimum(y1 + t, y2), y2, y2 - t, y2 - t], axis=1).ravel()
+    c0 = np.stack([x1, x1, x1, np.maximum(x2 - t, x1 + t)], axis=1).ravel()
+    c1 = np.stack([x2, x2, np.minimum(x1 + t, x2), x2], axis=1).ravel()
+
+    rows, cols, ids = _rect_pixels(r0, r1, c0, c1)
+    return rows, cols, ids // 4
+
+
+def _fill_boxes(target, boxes, colors, alpha):
+    # Заливка срезами по одной рамке: без индексов по пикселям. Рамки идут
+    # по порядку, поэтому поздняя перекрывает раннюю; при alpha < 1
+    # перекрывающиеся заливки смешиваются одна поверх другой
+    channels = target.shape[2] if target.ndim == 3 else 1
+    band = max(1, BLEND_ELEMENTS // max(target.shape[1] * channels, 1))
+    integer = np.issubdtype(target.dtype, np.integer)
+
+    for i, (x1, y1, x2, y2) in enumerate(zip(*_clip_boxes(target.shape, boxes))):
+        color = colors[i if len(colors) > 1 else 0]
+        if alpha >= 1.0:
+            target[y1:y2, x1:x2] = color
+            continue
+
+        color = color.astype(np.float32)
+        for row in range(y1, y2, band):
+            region = target[row:min(row + band, y2), x1:x2]
+            blended = region.astype(np.float32)
+            blended += alpha * (color - blended)
+            if integer:
+                np.rint(blended, out=blended)
+            region[...] = blended
+
+
+def rectangles(
+    img,
+    boxes,
+    colors,
+    thickness=1,
+    fill=False,
+    alpha=1.0,
+    copy=True,
+    out=None,
+    indices=None,
+):
+    # Рисует все рамки за один проход: colors - один цвет или (N, C) цвета.
+    # При пересечении рамок побеждает рамка, идущая позже
+    if out is not None:
+        np.copyto(out, img)
+        result = out
+    else:
+        result = img.copy() if copy else img
+
+    colors = np.asarray(colors)
+    if colors.ndim == result.ndim - 2:
+        # Один цвет на все рамки
+        colors = colors[np.newaxis]
+    box_count = np.asarray(boxes).reshape(-1, 4).shape[0]
+    if len(colors) not in (1, box_count):
+        raise ValueError(
+            f"цветов должно быть 1 или по одному на рамку ({box_count}), получено {len(colors)}"
+        )
+    target = _color_view(result, colors[0])
+
+    if fill and indices is None:
+        _fill_boxes(target, boxes, colors, alpha)
+        return result
+
+    if indices is None:
+        indices = box_indices(result.shape, boxes, thickness, fill)
+    rows, cols, ids = indices
+
+    # Один цвет присваивается всем пикселям без массива цветов по пикселям
+    pixel_colors = colors[0] if len(colors) == 1 else colors[ids]
+
+    if alpha < 1.0:
+        # Смешивание с исходными пикселями
+        background = target[rows, cols].astype(np.float32)
+        pixel_colors = background + alpha * (pixel_colors - background)
+        if np.issubdtype(result.dtype, np.integer):
+            pixel_colors = np.rint(pixel_colors)
+
+    target[rows, cols] = pixel_colors
     return result
 
 
-def rm_color(img, c):
-    result = img.copy()
+def rm_color(img, c, copy=True):
+    # copy=False обнуляет канал прямо в исходном массиве
+    result = img.copy() if copy else img
 
     if len(result.shape) == 3:
         result[:, :, c] = 0
@@ -44,56 +277,103 @@ def rm_color(img, c):
     return result
 
 
-def rotate(img):
-    result = img.copy()
-
-    if len(result.shape) == 2:
+def rotate(img, copy=True):
+    if len(img.shape) == 2:
         # Для черно-белых изображений (2D)
-        result = np.rot90(result, k=-1)
+        result = np.rot90(img, k=-1)
     else:
         # Для цветных изображений (3D)
-        result = np.rot90(result, k=-1, axes=(0, 1))
-
-    return result
+        result = np.rot90(img, k=-1, axes=(0, 1))
 
+    # np.rot90 возвращает view, копия нужна только при copy=True
+    return result.copy() if copy else result
 
-def flip(img, mode):
-    result = img.copy()
 
+def flip(img, mode, copy=True):
     if mode == "vertical":
         # Отражаем по вертикали (верх-низ)
-        result = np.flipud(result)
+        result = np.flipud(img)
     elif mode == "horizontal":
         # Отражаем по горизонтали (лево-право)
-        result = np.fliplr(result)
+        result = np.fliplr(img)
     else:
         raise ValueError("mode должен быть 'vertical' или 'horizontal'")
 
-    return result
+    # np.flipud/np.fliplr возвращают view, копия нужна только при copy=True
+    return result.copy() if copy else result
 
 
-def make_gray(img, mode):
-    result = img.copy()
-
-    if len(result.shape) == 3:  # Если цветное изображение
-        # Разделяем каналы
-        r = result[:, :, 0].astype(np.float32)
-        g = result[:, :, 1].astype(np.float32)
-        b = result[:, :, 2].astype(np.float32)
-
-        if mode == "mean":
-            # Среднее значение
-            gray = (r + g + b) / 3
-        elif mode == "max":
-            # Максимальное значение
-            gray = np.maximum.reduce([r, g, b])
-        elif mode == "min":
-            # Минимальное значение
-            gray = np.minimum.reduce([r, g, b])
-        else:
-            raise ValueError("mode должен быть 'mean', 'max' или 'min'")
+# Тип накопителя для суммы трёх каналов: сумма не должна переполняться
+GRAY_ACCUMULATORS = {np.dtype(np.uint8): np.uint16, np.dtype(np.uint16): np.uint32}
+
+
+def _gray_plane(img, mode, out=None):
+    if mode not in ("mean", "max", "min"):
+        raise ValueError("mode должен быть 'mean', 'max' или 'min'")
+
+    # Каналы берутся по последней оси, поэтому функция подходит и для пачек
+    r = img[..., 0]
+    g = img[..., 1]
+    b = img[..., 2]
+
+    # Результат того же типа, что и исходник: без перехода во float и обратно
+    if out is None:
+        out = np.empty(img.shape[:-1], dtype=img.dtype)
+
+    if mode == "max":
+        np.maximum(r, g, out=out)
+        np.maximum(out, b, out=out)
+    elif mode == "min":
+        np.minimum(r, g, out=out)
+        np.minimum(out, b, out=out)
+    elif np.issubdtype(img.dtype, np.floating):
+        # float: среднее считается в исходной точности прямо в out
+        np.add(r, g, out=out)
+        np.add(out, b, out=out)
+        np.divide(out, 3, out=out)
+    else:
+        # Целые: сумма в более широком типе (uint8 -> uint16, uint16 -> uint32),
+        # целочисленное деление совпадает с отбрасыванием дробной части
+        acc = np.add(r, g, dtype=GRAY_ACCUMULATORS.get(img.dtype, np.int64))
+        np.add(acc, b, out=acc)
+        np.floor_divide(acc, 3, out=acc)
+        np.copyto(out, acc, casting="unsafe")
+
+    return out
 
-        gray = np.clip(gray, 0, 255).astype(np.uint8)
-        result = np.stack([gray, gray, gray], axis=-1)
 
+def _spread_gray(gray, img, result):
+    # Серый канал копируется в R, G, B; остальные каналы (альфа) сохраняются.
+    # Поканальное копирование заметно быстрее broadcast-присваивания
+    for c in range(3):
+        result[..., c] = gray
+    if result is not img and img.shape[-1] > 3:
+        result[..., 3:] = img[..., 3:]
     return result
+
+
+def make_gray(img, mode, copy=True, out=None, channels=3, broadcast=False):
+    # out - буфер (H, W) для серого канала, тип результата совпадает с img
+    # channels=1 возвращает одноканальный (H, W) результат
+    # broadcast=True возвращает (H, W, 3) view только для чтения над одним
+    # каналом (для изображений с альфа-каналом результат всё равно копируется)
+    if len(img.shape) != 3:
+        # Черно-белое изображение уже серое
+        return img.copy() if copy else img
+
+    if channels not in (1, 3):
+        raise ValueError("channels должен быть 1 или 3")
+
+    gray = _gray_plane(img, mode, out)
+
+    if channels == 1:
+        return gray
+
+    if not copy:
+        # copy=False записывает результат прямо в исходный массив
+        return _spread_gray(gray, img, img)
+
+    if broadcast and img.shape[2] == 3:
+        return np.broadcast_to(gray[:, :, np.newaxis], (*gray.shape, 3))
+
+    return _spread_gray(gray, img, np.empty(img.shape, dtype=img.dtype))
@@ -1,11 +1,39 @@
+import tempfile
+import tracemalloc
+
 import numpy as np
+from PIL import Image
 
+from batch import (
+    as_batch,
+    batch_crop_image,
+    batch_flip,
+    batch_make_gray,
+    batch_rectangle,
+    batch_rm_color,
+    batch_rotate,
+    save_batch,
+)
+from cache import ResultCache
+from colorspace import to_hsv, to_ycbcr
+from pipeline import Pipeline
+from resize import resize
+from tiled import (
+    open_tiled,
+    tiled_flip,
+    tiled_make_gray,
+    tiled_rectangle,
+    tiled_rm_color,
+)
 from task import (
+    box_indices,
     crop_image,
     flip,
     make_gray,
     read_img,
+    read_region,
     rectangle,
+    rectangles,
     rm_color,
     rotate,
     save_img,
@@ -52,3 +80,216 @@ for gray_mode in gray_modes:
     gray_img = make_gray(img=np_image, mode=gray_mode)
 
     save_img(gray_img, f"results/gray_{gray_mode}.jpg")
+
+# Тест copy=False: view и in-place без выделения памяти
+tracemalloc.start()
+
+view_img = crop_image(img=np_image, x1=100, x2=200, y1=200, y2=300, copy=False)
+assert np.shares_memory(view_img, np_image)
+
+view_img = rotate(img=np_image, copy=False)
+assert np.shares_memory(view_img, np_image)
+
+for flip_mode in flip_modes:
+    view_img = flip(img=np_image, mode=flip_mode, copy=False)
+    assert np.shares_memory(view_img, np_image)
+
+inplace_img = np_image.copy()
+tracemalloc.reset_peak()
+before, _ = tracemalloc.get_traced_memory()
+assert rm_color(img=inplace_img, c=0, copy=False) is inplace_img
+assert (
+    rectangle(
+        img=inplace_img, x1=100, x2=200, y1=200, y2=300, pixel=[255, 0, 0], copy=False
+    )
+    is inplace_img
+)
+_, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+# Прирост пика памяти не должен приближаться к размеру изображения
+assert peak - before < inplace_img.nbytes // 10, peak - before
+
+# Тест Pipeline: ленивая цепочка даёт тот же результат, что и пошаговая
+eager_img = make_gray(
+    img=flip(
+        img=rotate(img=crop_image(img=np_image, x1=100, x2=300, y1=200, y2=300)),
+        mode="horizontal",
+    ),
+    mode="mean",
+)
+pipeline = (
+    Pipeline(np_image)
+    .crop_image(x1=100, x2=300, y1=200, y2=300)
+    .rotate()
+    .flip(mode="horizontal")
+    .make_gray(mode="mean")
+)
+assert np.array_equal(pipeline.run(), eager_img)
+assert not np.shares_memory(pipeline.run(), np_image)
+
+pipeline.save_img("results/pipeline.jpg")
+
+# Тест пакетных функций: результат совпадает с поштучной обработкой
+frames = [np_image, rm_color(img=np_image, c=1), flip(img=np_image, mode="vertical")]
+batch = as_batch(frames)
+
+batch_checks = [
+    (
+        batch_crop_image(batch, x1=100, x2=200, y1=200, y2=300),
+        [crop_image(img=f, x1=100, x2=200, y1=200, y2=300) for f in frames],
+    ),
+    (
+        batch_rectangle(batch, x1=100, x2=200, y1=200, y2=300, pixel=[255, 0, 0]),
+        [
+            rectangle(img=f, x1=100, x2=200, y1=200, y2=300, pixel=[255, 0, 0])
+            for f in frames
+        ],
+    ),
+    (batch_rm_color(batch, c=2), [rm_color(img=f, c=2) for f in frames]),
+    (batch_rotate(batch), [rotate(img=f) for f in frames]),
+    (batch_flip(batch, mode="horizontal"), [flip(f, "horizontal") for f in frames]),
+    (batch_make_gray(batch, mode="mean"), [make_gray(f, "mean") for f in frames]),
+]
+for batch_result, expected in batch_checks:
+    assert np.array_equal(batch_result, np.stack(expected))
+
+# RGB цвет на пачке RGBA меняет только цветовые каналы, серая пачка
+# принимает цвет из одного значения
+alpha = np.full(np_image.shape[:2] + (1,), 128, dtype=np.uint8)
+rgba_frames = [np.concatenate([f, alpha], axis=2) for f in frames]
+gray_frames = [f[:, :, 0] for f in frames]
+for pixel_frames, pixel in ((rgba_frames, [255, 0, 0]), (gray_frames, [255])):
+    assert np.array_equal(
+        batch_rectangle(as_batch(pixel_frames), x1=100, x2=200, y1=200, y2=300, pixel=pixel),
+        np.stack(
+            [rectangle(f, x1=100, x2=200, y1=200, y2=300, pixel=pixel) for f in pixel_frames]
+        ),
+    )
+
+save_batch(batch_rotate(batch), [f"results/batch_{i}.jpg" for i in range(len(frames))])
+
+# Тест read_region: декодируется только нужная область
+region_img = read_region("cat.jpg", x1=100, x2=200, y1=200, y2=300)
+assert np.array_equal(region_img, cropped_img)
+
+region_img = read_region("cat.jpg", x1=100, x2=300, y1=200, y2=400, scale=4)
+assert region_img.shape[:2] == (50, 50)
+
+save_img(region_img, "results/region_x4.jpg")
+
+# Тест ResultCache: повторная цепочка отдаётся из кэша
+with tempfile.TemporaryDirectory() as cache_dir:
+    cache = ResultCache(cache_dir)
+    first = pipeline.run(cache=cache)
+    assert np.array_equal(first, eager_img)
+    assert pipeline.run(cache=cache) is first
+
+    # Новый экземпляр с тем же каталогом читает результат с диска
+    disk_cache = ResultCache(cache_dir)
+    cached_pipeline = Pipeline("cat.jpg").rotate().make_gray(mode="min")
+    cached_pipeline.run(cache=cache)
+    assert np.array_equal(cached_pipeline.run(cache=disk_cache), cached_pipeline.run())
+
+    assert cache.stats["misses"] == 2 and cache.stats["memory_hits"] == 1
+    assert disk_cache.stats["disk_hits"] == 1
+
+# Тест rectangles: много рамок за один проход
+boxes = np.array([[100, 200, 200, 300], [150, 250, 400, 500], [10, 10, 60, 40]])
+box_colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]])
+
+expected_img = np_image.copy()
+for (x1, y1, x2, y2), color in zip(boxes, box_colors):
+    rectangle(expected_img, x1, y1, x2, y2, color, copy=False)
+assert np.array_equal(rectangles(np_image, boxes, box_colors), expected_img)
+
+# Заливка срезами совпадает с заливкой по индексам пикселей
+filled_boxes = np.array([[-10, -5, 50, 60], [100, 100, 390, 290], [60, 10, 90, 400]])
+for alpha in (1.0, 0.3):
+    indices = box_indices(np_image.shape, filled_boxes, fill=True)
+    assert np.array_equal(
+        rectangles(np_image, filled_boxes, box_colors, fill=True, alpha=alpha),
+        rectangles(np_image, filled_boxes, box_colors, fill=True, alpha=alpha, indices=indices),
+    )
+
+boxes_img = rectangles(np_image, boxes, box_colors, thickness=5)
+boxes_img = rectangles(boxes_img, boxes[:1], [255, 255, 0], fill=True, alpha=0.3)
+
+save_img(boxes_img, "results/rectangles.jpg")
+
+# Тест resize и цветовых пространств вместе с геометрическими операциями
+for method in ("area", "bilinear", "lanczos"):
+    resized_img = resize(rotate(img=cropped_img, copy=False), (50, 80), method)
+    assert resized_img.shape == (80, 50, 3) and resized_img.dtype == np.uint8
+
+    save_img(resized_img, f"results/resize_{method}.jpg")
+
+# Увеличение area совпадает с BOX из PIL, в том числе на точных серединах
+# между пикселями, где выбирается правый исходный пиксель
+ramp = np.array([[0, 80, 160, 240]], dtype=np.uint8)
+assert np.array_equal(
+    resize(ramp, (10, 1), "area"), np.asarray(Image.fromarray(ramp).resize((10, 1), Image.BOX))
+)
+area_src = np_image[:, :800]
+for size in ((1000, area_src.shape[0]), (1000, 700)):
+    pil_img = np.asarray(Image.fromarray(area_src).resize(size, Image.BOX))
+    assert np.array_equal(resize(area_src, size, "area"), pil_img)
+
+# Изменение размера без изменения размера возвращает копию исходника
+assert np.array_equal(resize(np_image, np_image.shape[1::-1]), np_image)
+
+hsv_img = to_hsv(flip(img=cropped_img, mode="vertical", copy=False))
+ycbcr_img = to_ycbcr(cropped_img)
+assert hsv_img.shape == ycbcr_img.shape == cropped_img.shape
+
+save_img(hsv_img, "results/hsv.jpg")
+save_img(ycbcr_img, "results/ycbcr.jpg")
+
+# Тест поблочной обработки: блоки 100 не делят 1030x777 нацело, поэтому
+# проверяются и неполные блоки у правого и нижнего края
+tiled_img = resize(np_image, (1030, 777))
+with tempfile.TemporaryDirectory() as tiled_dir:
+    png_path = f"{tiled_dir}/scan.png"
+    save_img(tiled_img, png_path)
+    np.save(f"{tiled_dir}/scan.npy", tiled_img)
+
+    src = open_tiled(png_path)
+    assert np.array_equal(src, tiled_img)
+    assert np.array_equal(open_tiled(f"{tiled_dir}/scan.npy"), tiled_img)
+
+    tiled_checks = [
+        (
+            tiled_make_gray(src, f"{tiled_dir}/gray.npy", "mean", tile=100),
+            make_gray(tiled_img, "mean"),
+        ),
+        (
+            tiled_rm_color(src, f"{tiled_dir}/rm.npy", 1, tile=100),
+            rm_color(tiled_img, 1),
+        ),
+        (
+            tiled_rectangle(
+                src, f"{tiled_dir}/rect.npy", 95, 150, 905, 705, [255, 0, 0], tile=100
+            ),
+            rectangle(tiled_img, 95, 150, 905, 705, [255, 0, 0]),
+        ),
+    ]
+    for mode in ("vertical", "horizontal"):
+        tiled_checks.append(
+            (
+                tiled_flip(src, f"{tiled_dir}/flip_{mode}.npy", mode, tile=100),
+                flip(tiled_img, mode),
+            )
+        )
+    for tiled_result, expected in tiled_checks:
+        assert np.array_equal(tiled_result, expected)
+
+    # max_pixels ограничивает размер, а глобальный предел PIL не меняется
+    pil_limit = Image.MAX_IMAGE_PIXELS
+    try:
+        open_tiled(png_path, max_pixels=1000)
+    except Image.DecompressionBombError:
+        pass
+    else:
+        raise AssertionError("open_tiled не проверил max_pixels")
+    assert Image.MAX_IMAGE_PIXELS == pil_limit
+    del src, tiled_checks, tiled_result
@@ -0,0 +1,180 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from task import make_gray, rectangle, rm_color
+
+# Поблочная обработка огромных изображений: исходник и результат лежат
+# в файлах, отображённых в память (np.memmap / .npy), а в RAM одновременно
+# находится только один блок, поэтому пиковая память зависит от размера
+# блока, а не от размера изображения
+
+DEFAULT_TILE = 1024
+DECODE_BAND = 256
+
+# Предел размера для decode_to_memmap вместо защиты PIL от decompression
+# bomb (около 179 Мп): гигапиксельные сканы проходят, а бомбы - нет.
+# Больше можно разрешить явно через max_pixels
+DEFAULT_MAX_PIXELS = 1 << 32
+
+# Image.MAX_IMAGE_PIXELS - глобальная настройка PIL: подмена под блокировкой
+# и только на время Image.open, где PIL проверяет размер
+_pil_limit_lock = threading.Lock()
+
+
+def _open_large(path, max_pixels):
+    with _pil_limit_lock:
+        previous_limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = max_pixels
+        try:
+            im = Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = previous_limit
+
+    # PIL падает только на 2 * MAX_IMAGE_PIXELS, а max_pixels - точный предел
+    width, height = im.size
+    if width * height > max_pixels:
+        im.close()
+        raise Image.DecompressionBombError(
+            f"{path}: {width * height} пикселей больше max_pixels={max_pixels}"
+        )
+    return im
+
+
+def decode_to_memmap(path, backing_path=None, max_pixels=DEFAULT_MAX_PIXELS):
+    # Переносит декодированное изображение в .npy файл полосами и возвращает
+    # его memmap: сжатые форматы PIL декодирует целиком в свой буфер, но
+    # второй полной копии в numpy при этом не создаётся.
+    #
+    # Без backing_path файл создаётся во временном каталоге и сразу
+    # удаляется: отображение в память остаётся рабочим, а место на диске
+    # освобождается, когда memmap будет собран. Каталог исходника не
+    # трогаем, чтобы не затереть лежащий рядом scan.npy.
+    #
+    # PIL отказывается открывать изображения больше 2 * MAX_IMAGE_PIXELS
+    # (около 179 Мп) как защиту от decompression bomb, а этот путь нужен
+    # как раз для гигапиксельных сканов. Поэтому предел задаёт max_pixels
+    path = Path(path)
+    temporary = backing_path is None
+    if temporary:
+        fd, backing_path = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+    backing_path = Path(backing_path)
+
+    try:
+        with _open_large(path, max_pixels) as im:
+            width, height = im.size
+            channels = len(im.getbands())
+            shape = (height, width) if channels == 1 else (height, width, channels)
+            dtype = np.asarray(im.crop((0, 0, 1, 1))).dtype
+
+            out = create_output(backing_path, shape, dtype)
+            # crop тоже проверяет размер по пределу PIL: полоса очень широкого
+            # скана становится ниже, чтобы уложиться в него
+            band = DECODE_BAND
+            if Image.MAX_IMAGE_PIXELS:
+                band = max(1, min(band, Image.MAX_IMAGE_PIXELS // width))
+            for y in range(0, height, band):
+                y2 = min(y + band, height)
+                out[y:y2] = np.asarray(im.crop((0, y, width, y2)))
+
+        out.flush()
+        del out
+        result = np.load(backing_path, mmap_mode="r")
+    except BaseException:
+        if temporary:
+            backing_path.unlink(missing_ok=True)
+        raise
+
+    if temporary:
+        try:
+            backing_path.unlink()
+        except OSError:
+            # Windows не удаляет отображённый файл: остаётся во временном каталоге
+            pass
+    return result
+
+
+def open_tiled(
+    path, shape=None, dtype=np.uint8, backing_path=None, max_pixels=DEFAULT_MAX_PIXELS
+):
+    # .npy и сырые .raw файлы отображаются в память без декодирования,
+    # остальные форматы один раз декодируются в .npy (см. decode_to_memmap)
+    path = Path(path)
+
+    if path.suffix == ".npy":
+        return np.load(path, mmap_mode="r")
+    if path.suffix == ".raw":
+        if shape is None:
+            raise ValueError("для .raw файла нужно указать shape")
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+    return decode_to_memmap(path, backing_path, max_pixels)
+
+
+def iter_tiles(shape, tile=DEFAULT_TILE):
+    # Обход блоков по строкам, чтобы чтение memmap шло последовательно
+    height, width = shape[:2]
+    for y in range(0, height, tile):
+        for x in range(0, width, tile):
+            yield slice(y, min(y + tile, height)), slice(x, min(x + tile, width))
+
+
+def create_output(path, shape, dtype):
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def tiled_make_gray(src, dst_path, mode, tile=DEFAULT_TILE):
+    # make_gray сохраняет тип и альфа-канал, поэтому форма результата та же
+    out = create_output(dst_path, src.shape, src.dtype)
+    for ys, xs in iter_tiles(src.shape, tile):
+        # Результат блока сразу уходит в выходной memmap
+        out[ys, xs] = make_gray(src[ys, xs], mode)
+
+    out.flush()
+    return out
+
+
+def tiled_rm_color(src, dst_path, c, tile=DEFAULT_TILE):
+    out = create_output(dst_path, src.shape, src.dtype)
+    for ys, xs in iter_tiles(src.shape, tile):
+        out[ys, xs] = src[ys, xs]
+        rm_color(out[ys, xs], c, copy=False)
+
+    out.flush()
+    return out
+
+
+def tiled_flip(src, dst_path, mode, tile=DEFAULT_TILE):
+    if mode not in ("vertical", "horizontal"):
+        raise ValueError("mode должен быть 'vertical' или 'horizontal'")
+
+    height, width = src.shape[:2]
+    out = create_output(dst_path, src.shape, src.dtype)
+
+    for ys, xs in iter_tiles(src.shape, tile):
+        if mode == "vertical":
+            # Блок зеркально переезжает по вертикали и отражается внутри
+            dst_ys = slice(height - ys.stop, height - ys.start)
+            out[dst_ys, xs] = src[ys, xs][::-1]
+        else:
+            dst_xs = slice(width - xs.stop, width - xs.start)
+            out[ys, dst_xs] = src[ys, xs][:, ::-1]
+
+    out.flush()
+    return out
+
+
+def tiled_rectangle(src, dst_path, x1, y1, x2, y2, pixel, tile=DEFAULT_TILE):
+    out = create_output(dst_path, src.shape, src.dtype)
+    for ys, xs in iter_tiles(src.shape, tile):
+        out[ys, xs] = src[ys, xs]
+
+    # Рамка затрагивает только граничные строки и столбцы memmap
+    rectangle(out, x1, y1, x2, y2, pixel, copy=False)
+
+    out.flush()
+    return out
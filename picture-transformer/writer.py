@@ -0,0 +1,66 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from task import save_img
+
+
+class ImageWriter:
+    # Очередь записи изображений на пуле потоков. PIL отпускает GIL во время
+    # работы кодека, поэтому кодирование нескольких файлов идёт параллельно,
+    # а вызывающий код не ждёт окончания записи
+
+    def __init__(self, max_workers=None, max_pending=None, **save_options):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Ограничение очереди: submit блокируется, пока в полёте max_pending задач
+        self.max_pending = max_pending or self.max_workers * 2
+        self.save_options = save_options
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def submit(self, img_array, path, copy=False, **save_options):
+        # copy=True нужен, если вызывающий код переиспользует массив сразу после вызова
+        if copy:
+            img_array = img_array.copy()
+
+        options = {**self.save_options, **save_options}
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(save_img, img_array, path, **options)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done() or f.exception()]
+            self._futures.append(future)
+
+        return future
+
+    def flush(self):
+        # Ждёт завершения всех записей и пробрасывает первую ошибку
+        with self._lock:
+            futures, self._futures = self._futures, []
+
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,159 @@
+import argparse
+import os
+import timeit
+
+import numpy as np
+
+from matrics import (
+    apply_where,
+    column_means,
+    column_means_naive,
+    minmax,
+    minmax_naive,
+    negate_between,
+    negate_between_naive,
+    zero_max,
+    zero_max_naive,
+)
+
+
+def bench(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение наивных и блочных версий")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=1_000)
+    parser.add_argument("--dtype", default="int64")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="до скольких потоков"
+    )
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 20, (args.rows, args.cols)).astype(args.dtype)
+    vector = arr.reshape(-1)
+    out = np.empty(arr.shape[1], dtype=np.float64)
+
+    # Блочные версии должны давать тот же результат
+    assert minmax(arr) == minmax_naive(arr)
+    assert np.allclose(column_means(arr), column_means_naive(arr))
+    assert np.array_equal(zero_max(vector), zero_max_naive(vector))
+    assert np.array_equal(negate_between(arr, 3, 8), negate_between_naive(arr, 3, 8))
+
+    inplace = arr.copy()
+    cases = [
+        ("minmax", lambda: minmax_naive(arr), lambda: minmax(arr)),
+        (
+            "column_means",
+            lambda: column_means_naive(arr),
+            lambda: column_means(arr, out=out),
+        ),
+        (
+            "zero_max",
+            lambda: zero_max_naive(vector),
+            lambda: zero_max(inplace.reshape(-1), copy=False),
+        ),
+        (
+            "negate_between",
+            lambda: negate_between_naive(arr, 3, 8),
+            lambda: reset_and(inplace, arr, negate_between, inplace, 3, 8, out=inplace),
+        ),
+    ]
+
+    print(f"Массив {arr.shape} {arr.dtype}, {arr.nbytes / 2**20:.0f} МБ")
+    print(f"{'операция':<16} {'наивная, мс':>12} {'блочная, мс':>12} {'ускорение':>10}")
+    for name, naive, fused in cases:
+        naive_time = bench(naive)
+        fused_time = bench(fused)
+        print(
+            f"{name:<16} {naive_time * 1000:12.2f} {fused_time * 1000:12.2f} "
+            f"{naive_time / fused_time:9.2f}x"
+        )
+
+    bench_apply_where(arr)
+    bench_scaling(arr, args.workers)
+
+
+def reset_and(work, source, func, *args, **kwargs):
+    # Операции на месте меняют work, поэтому перед каждым замером он
+    # восстанавливается из исходника: иначе повторные запуски видят уже
+    # преобразованные данные. Копирование входит в замер, как и в наивных
+    # версиях
+    np.copyto(work, source)
+    return func(*args, **kwargs)
+
+
+def bench_apply_where(arr):
+    # Маска и fancy-index присваивание против поблочного apply_where на месте
+    def naive_scale():
+        result = arr.copy()
+        mask = (result > 3) & (result < 8)
+        result[mask] = result[mask] * 3
+        return result
+
+    def naive_clip():
+        result = arr.copy()
+        mask = (result > 3) & (result < 8)
+        result[mask] = np.clip(result[mask], 5, 6)
+        return result
+
+    def inplace(op, value=None):
+        return lambda: reset_and(work, arr, apply_where, work, 3, 8, op, value, out=work)
+
+    def naive_set():
+        result = arr.copy()
+        result[(result > 3) & (result < 8)] = 0
+        return result
+
+    work = arr.copy()
+    cases = [
+        ("negate", lambda: negate_between_naive(arr, 3, 8), inplace("negate")),
+        ("scale", naive_scale, inplace("scale", 3)),
+        ("clip", naive_clip, inplace("clip", (5, 6))),
+        ("set", naive_set, inplace("set", 0)),
+    ]
+
+    print("\napply_where на месте против маски и fancy-index")
+    print(f"{'операция':<16} {'наивная, мс':>12} {'на месте, мс':>12} {'ускорение':>10}")
+    for name, naive, fused in cases:
+        naive_time = bench(naive)
+        inplace_time = bench(fused)
+        print(
+            f"{name:<16} {naive_time * 1000:12.2f} {inplace_time * 1000:12.2f} "
+            f"{naive_time / inplace_time:9.2f}x"
+        )
+
+
+def bench_scaling(arr, max_workers):
+    # Параллельный результат должен побитово совпадать с последовательным
+    serial_means = column_means(arr)
+    serial_minmax = minmax(arr)
+    serial_negated = negate_between(arr, 3, 8)
+
+    cases = {
+        "minmax": lambda w: minmax(arr, workers=w),
+        "column_means": lambda w: column_means(arr, workers=w),
+        "negate_between": lambda w: negate_between(arr, 3, 8, workers=w),
+    }
+
+    print("\nМасштабирование по потокам, мс (ускорение относительно 1 потока)")
+    print(f"{'потоков':<8}" + "".join(f"{name:>24}" for name in cases))
+    base = {}
+    for workers in range(1, max_workers + 1):
+        assert np.array_equal(column_means(arr, workers=workers), serial_means)
+        assert minmax(arr, workers=workers) == serial_minmax
+        negated = negate_between(arr, 3, 8, workers=workers)
+        assert np.array_equal(negated, serial_negated)
+
+        row = f"{workers:<8}"
+        for name, func in cases.items():
+            seconds = bench(lambda: func(workers))
+            base.setdefault(name, seconds)
+            row += f"{seconds * 1000:16.2f} ({base[name] / seconds:4.2f}x)"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
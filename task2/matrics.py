@@ -1,23 +1,455 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-# 1. Массив 10x10 с min и max
-arr1 = np.random.randint(0, 100, (10, 10))
-print("1. Минимум:", arr1.min(), "Максимум:", arr1.max())
-
-# 2. Массив 10x10 со средним по столбцам
-arr2 = np.random.randint(0, 100, (10, 10))
-print("\n2. Средние по столбцам:", arr2.mean(axis=0))
-
-# 3. Вектор с заменой max на 0
-vector = np.random.randint(0, 100, 10)
-vector_modified = vector.copy()
-vector_modified[np.argmax(vector)] = 0
-print(f"\n3. Исходный: {vector}")
-print(f"   Модифицированный: {vector_modified}")
-
-# 4. Изменение знака у элементов между 3 и 8
-arr4 = np.random.randint(0, 20, (5, 5))
-mask = (arr4 > 3) & (arr4 < 8)
-arr4[mask] = -arr4[mask]
-print("\n4. Массив после изменения знака:")
-print(arr4)
\ No newline at end of file
+# Массив обрабатывается блоками строк: блок помещается в кэш процессора,
+# поэтому несколько проходов по блоку (например min и max) стоят почти как
+# один проход по памяти, а временные буферы ограничены размером блока
+BLOCK_BYTES = 1 << 18
+
+# Файлы больше памяти читаются крупными блоками в один переиспользуемый
+# буфер, поэтому пиковая память равна размеру блока, а не файла
+FILE_BLOCK_BYTES = 1 << 26
+
+# Единица работы для потоков. Границы кусков не зависят от числа потоков,
+# а частичные результаты объединяются в исходном порядке, поэтому
+# параллельный результат побитово совпадает с последовательным
+CHUNK_BYTES = 1 << 22
+
+
+def iter_blocks(arr, block_bytes=BLOCK_BYTES):
+    # Блоки - view по первой оси; для вектора блок - отрезок элементов
+    if arr.ndim == 0 or arr.shape[0] == 0:
+        return
+    row_bytes = max(arr[0].nbytes, 1) if arr.ndim > 1 else arr.itemsize
+    rows = max(1, block_bytes // row_bytes)
+    for start in range(0, arr.shape[0], rows):
+        yield arr[start : start + rows]
+
+
+def _flat(arr):
+    # Непрерывный массив разворачиваем в вектор без копирования, чтобы блоки
+    # были одинакового размера независимо от формы
+    return arr.reshape(-1) if arr.flags.c_contiguous else arr
+
+
+def _resolve_workers(workers):
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers должен быть положительным")
+    return workers
+
+
+def _map_chunks(func, arr, workers=1):
+    # Применяет func к кускам массива и отдаёт результаты по порядку.
+    # NumPy отпускает GIL в редукциях, поэтому потоки работают параллельно
+    chunks = iter_blocks(arr, CHUNK_BYTES)
+    workers = _resolve_workers(workers)
+    if workers == 1:
+        yield from map(func, chunks)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # В полёте не больше двух кусков на поток, чтобы не копить результаты
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _kahan_add(total, comp, value):
+    # Компенсированное (Kahan) сложение векторов: comp хранит потерянные
+    # младшие разряды, истинная сумма равна total - comp
+    y = value - comp
+    t = total + y
+    np.subtract(t - total, y, out=comp)
+    total[...] = t
+
+
+def open_matrix(path, mode="r"):
+    # .npy файл отображается в память; mode="r+" позволяет менять его на месте
+    return np.load(path, mmap_mode=mode)
+
+
+def create_matrix(path, shape, dtype):
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def read_blocks(path, block_bytes=FILE_BLOCK_BYTES):
+    # Последовательно читает .npy файл блоками строк в один и тот же буфер.
+    # Блок действителен только до следующей итерации
+    header = np.load(path, mmap_mode="r")
+    shape, dtype, offset = header.shape, header.dtype, header.offset
+    if header.ndim > 1 and not header.flags.c_contiguous:
+        raise ValueError("поддерживаются только массивы в порядке C")
+    del header
+
+    if not shape or shape[0] == 0:
+        return
+
+    row_bytes = max(int(np.prod(shape[1:])) * dtype.itemsize, 1)
+    rows = max(1, min(shape[0], block_bytes // row_bytes))
+    buf = np.empty((rows, *shape[1:]), dtype=dtype)
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for start in range(0, shape[0], rows):
+            block = buf[: min(rows, shape[0] - start)]
+            if f.readinto(memoryview(block).cast("B")) != block.nbytes:
+                raise ValueError(f"{path}: файл короче, чем указано в заголовке")
+            yield block
+
+
+def _file_subblocks(path, block_bytes):
+    # Крупный блок из файла дополнительно режется на блоки размером с кэш
+    for block in read_blocks(path, block_bytes):
+        yield from iter_blocks(block.reshape(-1))
+
+
+def _matrix_header(path):
+    header = open_matrix(path)
+    return header.shape, header.dtype
+
+
+# 1. Минимум и максимум за один проход
+def minmax(arr, block_bytes=BLOCK_BYTES, workers=1):
+    # workers > 1 (или None - по числу ядер) считает куски на пуле потоков
+    arr = np.asarray(arr)
+    if arr.size == 0:
+        raise ValueError("minmax для пустого массива не определён")
+
+    def chunk_minmax(chunk):
+        return _minmax_blocks(iter_blocks(chunk, block_bytes))
+
+    return _merge_minmax(_map_chunks(chunk_minmax, _flat(arr), workers))
+
+
+def minmax_file(path, block_bytes=FILE_BLOCK_BYTES):
+    shape, _ = _matrix_header(path)
+    if 0 in shape:
+        raise ValueError("minmax для пустого массива не определён")
+    return _minmax_blocks(_file_subblocks(path, block_bytes))
+
+
+def _minmax_blocks(blocks):
+    # Оба прохода идут по блоку, который уже лежит в кэше
+    return _merge_minmax((block.min(), block.max()) for block in blocks)
+
+
+def _merge_minmax(pairs):
+    # np.minimum/np.maximum, а не min/max: сравнение с NaN всегда ложно, и
+    # встроенные min/max теряли бы блок с NaN. Как и arr.min(), NaN в любом
+    # блоке даёт NaN в результате
+    lo = hi = None
+    for block_lo, block_hi in pairs:
+        lo = block_lo if lo is None else np.minimum(lo, block_lo)
+        hi = block_hi if hi is None else np.maximum(hi, block_hi)
+
+    return lo, hi
+
+
+def minmax_naive(arr):
+    return arr.min(), arr.max()
+
+
+# 2. Средние по столбцам
+def column_means(arr, out=None, block_bytes=BLOCK_BYTES, workers=1):
+    arr = np.asarray(arr)
+    if arr.ndim != 2:
+        raise ValueError("нужен двумерный массив")
+
+    def chunk_sums(chunk):
+        return _column_sums(iter_blocks(chunk, block_bytes), arr.shape[1])
+
+    acc = _merge_sums(_map_chunks(chunk_sums, arr, workers), arr.shape[1])
+    if out is None:
+        out = acc
+    return np.divide(acc, arr.shape[0], out=out)
+
+
+def column_means_file(path, out=None, block_bytes=FILE_BLOCK_BYTES):
+    shape, _ = _matrix_header(path)
+    if len(shape) != 2:
+        raise ValueError("нужен двумерный массив")
+
+    parts = (
+        _column_sums(iter_blocks(chunk), shape[1])
+        for block in read_blocks(path, block_bytes)
+        for chunk in iter_blocks(block, CHUNK_BYTES)
+    )
+    acc = _merge_sums(parts, shape[1])
+    if out is None:
+        out = acc
+    return np.divide(acc, shape[0], out=out)
+
+
+def _column_sums(blocks, cols):
+    # Суммы блоков (внутри блока NumPy суммирует попарно) копятся во float64
+    # с компенсацией; возвращается пара (сумма, поправка)
+    acc = np.zeros(cols, dtype=np.float64)
+    comp = np.zeros(cols, dtype=np.float64)
+    partial = np.empty_like(acc)
+    for block in blocks:
+        np.add.reduce(block, axis=0, dtype=np.float64, out=partial)
+        _kahan_add(acc, comp, partial)
+    return acc, comp
+
+
+def _merge_sums(parts, cols):
+    # Частичные суммы объединяются строго по порядку кусков
+    acc = np.zeros(cols, dtype=np.float64)
+    comp = np.zeros(cols, dtype=np.float64)
+    for part_acc, part_comp in parts:
+        _kahan_add(acc, comp, part_acc)
+        _kahan_add(acc, comp, -part_comp)
+    return acc - comp
+
+
+def column_means_naive(arr):
+    return arr.mean(axis=0)
+
+
+# 3. Замена максимума на 0
+def zero_max(arr, copy=True):
+    # copy=False заменяет максимум прямо в исходном массиве. Копия всегда в
+    # порядке C: np.array сохранил бы порядок Fortran, и _flat не развернул бы её
+    result = np.array(arr, order="C") if copy else arr
+    flat = _flat(result)
+    if flat is result and result.ndim != 1:
+        raise ValueError("copy=False возможен только для непрерывного массива")
+
+    flat[np.argmax(flat)] = 0
+    return result
+
+
+def zero_max_naive(vector):
+    vector_modified = vector.copy()
+    vector_modified[np.argmax(vector)] = 0
+    return vector_modified
+
+
+# 4. Изменение элементов из диапазона на месте
+# Маскированные ufunc с where= ветвятся на каждом элементе и при случайной
+# маске упираются в ошибки предсказания переходов. Поэтому, где это точно,
+# операция записывается без ветвлений: блок умножается на множитель или
+# сдвигается на (новое - старое) * маска во временном буфере work
+
+
+def _blend(block, mask, work):
+    # block = work там, где mask, иначе block без изменений
+    if np.issubdtype(block.dtype, np.integer):
+        np.subtract(work, block, out=work)
+        np.multiply(work, mask, out=work)
+        np.add(block, work, out=block)
+    else:
+        # Для float арифметика ломается на inf и nan, поэтому через where=
+        np.copyto(block, work, where=mask)
+
+
+def _op_negate(block, mask, value, work):
+    # Множитель 1 - 2 * mask: -1 в диапазоне и 1 вне его
+    np.multiply(mask, -2, out=work, casting="unsafe")
+    np.add(work, 1, out=work)
+    np.multiply(block, work, out=block)
+
+
+def _op_scale(block, mask, value, work):
+    if not np.issubdtype(block.dtype, np.integer) or not float(value).is_integer():
+        # Для float множитель 1 + (value - 1) * mask не равен value после
+        # округления, а при value = inf или nan даёт 0 * inf = nan вне
+        # диапазона. Дробный множитель для целых отбрасывает дробную часть
+        np.multiply(block, value, out=block, where=mask, casting="unsafe")
+        return
+
+    # Целый множитель для целых: 1 + (value - 1) * mask точен
+    np.multiply(mask, value - 1, out=work, casting="unsafe")
+    np.add(work, 1, out=work)
+    np.multiply(block, work, out=block)
+
+
+def _op_clip(block, mask, value, work):
+    lo, hi = value
+    np.clip(block, lo, hi, out=work)
+    _blend(block, mask, work)
+
+
+def _op_set(block, mask, value, work):
+    work.fill(value)
+    _blend(block, mask, work)
+
+
+# Имя операции -> функция (блок, маска, параметр, буфер), меняющая блок на месте
+WHERE_OPS = {
+    "negate": _op_negate,
+    "scale": _op_scale,
+    "clip": _op_clip,
+    "set": _op_set,
+}
+
+# Буферы маски и work свои у каждого потока и переиспользуются между вызовами
+_buffers = threading.local()
+
+
+def _block_buffers(block):
+    size = block.size
+    masks = getattr(_buffers, "masks", None)
+    if masks is None or masks.shape[1] < size:
+        masks = np.empty((2, size), dtype=bool)
+        _buffers.masks = masks
+
+    works = getattr(_buffers, "works", {})
+    _buffers.works = works
+    work = works.get(block.dtype)
+    if work is None or work.size < size:
+        work = np.empty(size, dtype=block.dtype)
+        works[block.dtype] = work
+
+    return (
+        masks[0, :size].reshape(block.shape),
+        masks[1, :size].reshape(block.shape),
+        work[:size].reshape(block.shape),
+    )
+
+
+def _resolve_op(op, value):
+    # op - имя из WHERE_OPS или любой унарный ufunc (np.sqrt, np.abs, ...)
+    if isinstance(op, np.ufunc):
+        return lambda block, mask, value, work: op(block, out=block, where=mask)
+    if op not in WHERE_OPS:
+        raise ValueError(f"op должен быть ufunc или одним из: {', '.join(WHERE_OPS)}")
+    if op != "negate" and value is None:
+        raise ValueError(f"для op='{op}' нужен параметр value")
+    return WHERE_OPS[op]
+
+
+def _apply_blocks(blocks, lo, hi, op_func, value, inclusive):
+    # Применяет операцию в каждом блоке на месте и отдаёт блок дальше.
+    # lo или hi = None означает отсутствие границы
+    lower = np.greater_equal if inclusive else np.greater
+    upper = np.less_equal if inclusive else np.less
+
+    for block in blocks:
+        mask, tmp, work = _block_buffers(block)
+        if lo is not None:
+            lower(block, lo, out=mask)
+        else:
+            mask.fill(True)
+        if hi is not None:
+            upper(block, hi, out=tmp)
+            np.logical_and(mask, tmp, out=mask)
+
+        op_func(block, mask, value, work)
+        yield block
+
+
+def apply_where(
+    arr,
+    lo,
+    hi,
+    op,
+    value=None,
+    out=None,
+    inclusive=False,
+    block_bytes=BLOCK_BYTES,
+    workers=1,
+):
+    # Применяет op к элементам из диапазона (lo, hi) ([lo, hi] при inclusive)
+    # поблочно, без временных массивов размером с arr.
+    # out=arr меняет массив на месте, без out результат пишется в копию
+    op_func = _resolve_op(op, value)
+
+    arr = np.asarray(arr)
+    if out is None:
+        out = arr.copy()
+    elif out is not arr:
+        np.copyto(out, arr)
+
+    def apply_chunk(chunk):
+        # Куски не пересекаются, поэтому потоки меняют их независимо
+        blocks = iter_blocks(chunk, block_bytes)
+        for _ in _apply_blocks(blocks, lo, hi, op_func, value, inclusive):
+            pass
+
+    for _ in _map_chunks(apply_chunk, _flat(out), workers):
+        pass
+    return out
+
+
+def apply_where_file(
+    src_path,
+    dst_path,
+    lo,
+    hi,
+    op,
+    value=None,
+    inclusive=False,
+    block_bytes=FILE_BLOCK_BYTES,
+):
+    # Результат пишется в новый .npy файл блок за блоком
+    op_func = _resolve_op(op, value)
+    shape, dtype = _matrix_header(src_path)
+
+    with open(dst_path, "wb") as f:
+        np.lib.format.write_array_header_2_0(
+            f,
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": shape,
+            },
+        )
+        for block in read_blocks(src_path, block_bytes):
+            # Крупный блок обрабатывается кусками размером с кэш, как в
+            # minmax_file: буферы маски и work в _block_buffers остаются
+            # размером BLOCK_BYTES, а не блока файла
+            blocks = iter_blocks(block.reshape(-1))
+            for _ in _apply_blocks(blocks, lo, hi, op_func, value, inclusive):
+                pass
+            block.tofile(f)
+
+
+def negate_between(arr, lo, hi, out=None, block_bytes=BLOCK_BYTES, workers=1):
+    # Изменение знака у элементов строго между lo и hi
+    return apply_where(
+        arr, lo, hi, "negate", out=out, block_bytes=block_bytes, workers=workers
+    )
+
+
+def negate_between_file(src_path, dst_path, lo, hi, block_bytes=FILE_BLOCK_BYTES):
+    apply_where_file(src_path, dst_path, lo, hi, "negate", block_bytes=block_bytes)
+
+
+def negate_between_naive(arr, lo, hi):
+    result = arr.copy()
+    mask = (result > lo) & (result < hi)
+    result[mask] = -result[mask]
+    return result
+
+
+if __name__ == "__main__":
+    # 1. Массив 10x10 с min и max
+    arr1 = np.random.randint(0, 100, (10, 10))
+    lo, hi = minmax(arr1)
+    print("1. Минимум:", lo, "Максимум:", hi)
+
+    # 2. Массив 10x10 со средним по столбцам
+    arr2 = np.random.randint(0, 100, (10, 10))
+    print("\n2. Средние по столбцам:", column_means(arr2))
+
+    # 3. Вектор с заменой max на 0
+    vector = np.random.randint(0, 100, 10)
+    vector_modified = zero_max(vector)
+    print(f"\n3. Исходный: {vector}")
+    print(f"   Модифицированный: {vector_modified}")
+
+    # 4. Изменение знака у элементов между 3 и 8
+    arr4 = np.random.randint(0, 20, (5, 5))
+    negate_between(arr4, 3, 8, out=arr4)
+    print("\n4. Массив после изменения знака:")
+    print(arr4)
@@ -0,0 +1,129 @@
+import argparse
+import gc
+import tempfile
+import time
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from columns import UserColumns
+from storage import JournalStorage, JsonStorage
+from user import User, UserStatus
+from user_manager import UserManager
+
+STATUSES = list(UserStatus)
+
+
+@dataclass
+class DictUser:
+    # Прежний User: обычный dataclass с __dict__ у каждого экземпляра
+    user_id: int
+    username: str
+    email: str
+    status: UserStatus = field(default=UserStatus.ACTIVE)
+
+
+def make_users(cls, count):
+    return [
+        cls(i, f"user{i}", f"user{i}@mail.ru", STATUSES[i % len(STATUSES)])
+        for i in range(1, count + 1)
+    ]
+
+
+def measure_memory(build):
+    # Сколько памяти остаётся занятой после построения, вместе со строками
+    gc.collect()
+    tracemalloc.start()
+    holder = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return holder, current
+
+
+def bench(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run_memory(count):
+    status = UserStatus.BANNED
+    modes = {
+        "dataclass": lambda: make_users(DictUser, count),
+        "slots": lambda: make_users(User, count),
+        "columns": lambda: UserColumns(make_users(User, count)),
+    }
+
+    print(f"Пользователей: {count}")
+    print(f"{'режим':<22} {'байт/польз.':>12} {'get_by_status, мс':>18} {'польз./с':>12}")
+    for name, build in modes.items():
+        holder, used = measure_memory(build)
+
+        if isinstance(holder, UserColumns):
+            cases = {
+                name: lambda: holder.get_by_status(status),
+                f"{name} (только id)": lambda: holder.ids_by_status(status),
+            }
+        else:
+            cases = {name: lambda: [u for u in holder if u.status == status]}
+
+        for case, func in cases.items():
+            found = len(func())
+            seconds = bench(func)
+            print(
+                f"{case:<22} {used / count:12.0f} {seconds * 1000:18.2f} "
+                f"{count / seconds:12.0f}"
+            )
+        del holder
+
+    # Индекс UserManager: поиск не зависит от числа пользователей, кроме
+    # копирования найденных в список
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = UserManager(storage=JsonStorage(Path(tmp) / "users.json"))
+        with manager.batch():
+            for user in make_users(User, count):
+                manager.add_user(user)
+
+        func = lambda: manager.get_by_status(status)
+        assert len(func()) == found
+        seconds = bench(func)
+        print(f"{'slots + индекс':<22} {'':>12} {seconds * 1000:18.2f} {count / seconds:12.0f}")
+
+
+def run_create(count):
+    # create_users на count / 4, count / 2 и count пользователях: при
+    # линейной сложности время на пользователя не растёт с размером
+    storages = {"json": JsonStorage, "journal": JournalStorage}
+
+    print(f"\n{'create_users':<22} {'пользователей':>14} {'всего, с':>10} {'мкс/польз.':>12}")
+    for name, storage in storages.items():
+        for size in (count // 4, count // 2, count):
+            with tempfile.TemporaryDirectory() as tmp:
+                manager = UserManager(storage=storage(Path(tmp) / "users.json"))
+                fields = ((f"user{i}", f"user{i}@mail.ru") for i in range(size))
+
+                start = time.perf_counter()
+                created = manager.create_users(fields)
+                manager.close()
+                seconds = time.perf_counter() - start
+
+                assert created[-1].user_id == size
+                del created, manager
+            print(f"{name:<22} {size:>14} {seconds:10.2f} {seconds / size * 1e6:12.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память и скорость хранения пользователей")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument(
+        "--cases", nargs="+", choices=["memory", "create"], default=["memory", "create"]
+    )
+    args = parser.parse_args(argv)
+
+    if "memory" in args.cases:
+        run_memory(args.count)
+    if "create" in args.cases:
+        run_create(args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from array import array
+from itertools import compress
+from typing import Dict, Iterable, Iterator, List, Optional
+from user import User, UserStatus
+
+# Статус хранится одним байтом - номером в UserStatus
+STATUSES = list(UserStatus)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+# Код удалённой строки: место освобождается только при compact()
+REMOVED = 255
+
+
+class UserColumns:
+    # Колоночное хранилище для больших неизменяемых выборок: вместо объекта
+    # User на каждого пользователя - параллельные массивы id, имён, email и
+    # кодов статуса. id и статусы лежат в array/bytearray без объектов
+    # Python, а поиск по статусу идёт по bytearray на C без цикла Python.
+    # Объекты User создаются только при чтении
+    def __init__(self, users: Iterable[User] = ()):
+        self.ids = array('q')
+        self.usernames: List[str] = []
+        self.emails: List[str] = []
+        self.statuses = bytearray()
+        # id -> номер строки, строится при первом get_by_id
+        self._rows: Optional[Dict[int, int]] = None
+        self._removed = 0
+        self.extend(users)
+
+    def append(self, user: User) -> None:
+        self.ids.append(user.user_id)
+        self.usernames.append(user.username)
+        self.emails.append(user.email)
+        self.statuses.append(STATUS_CODES[user.status])
+        if self._rows is not None:
+            self._rows[user.user_id] = len(self.ids) - 1
+
+    def extend(self, users: Iterable[User]) -> None:
+        for user in users:
+            self.append(user)
+
+    def __len__(self) -> int:
+        return len(self.ids) - self._removed
+
+    def _user_at(self, row: int) -> User:
+        return User(
+            user_id=self.ids[row],
+            username=self.usernames[row],
+            email=self.emails[row],
+            status=STATUSES[self.statuses[row]],
+        )
+
+    def __iter__(self) -> Iterator[User]:
+        for row, code in enumerate(self.statuses):
+            if code != REMOVED:
+                yield self._user_at(row)
+
+    def _row_of(self, user_id: int) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {
+                user_id: row
+                for row, user_id in enumerate(self.ids)
+                if self.statuses[row] != REMOVED
+            }
+        return self._rows.get(user_id)
+
+    def get_by_id(self, user_id: int) -> Optional[User]:
+        row = self._row_of(user_id)
+        if row is None:
+            return None
+        return self._user_at(row)
+
+    def _status_mask(self, status: UserStatus) -> bytes:
+        # Байт 1 там, где код совпадает, иначе 0 - один вызов translate
+        table = bytearray(256)
+        table[STATUS_CODES[status]] = 1
+        return self.statuses.translate(table)
+
+    def ids_by_status(self, status: UserStatus) -> array:
+        return array('q', compress(self.ids, self._status_mask(status)))
+
+    def get_by_status(self, status: UserStatus) -> List[User]:
+        rows = compress(range(len(self.ids)), self._status_mask(status))
+        return [self._user_at(row) for row in rows]
+
+    def count_by_status(self, status: UserStatus) -> int:
+        return self.statuses.count(STATUS_CODES[status])
+
+    def delete(self, user_id: int) -> bool:
+        row = self._row_of(user_id)
+        if row is None:
+            return False
+
+        self.statuses[row] = REMOVED
+        del self._rows[user_id]
+        self._removed += 1
+        return True
+
+    def compact(self) -> None:
+        # Убирает строки удалённых пользователей из всех колонок
+        if not self._removed:
+            return
+
+        keep = self.statuses.translate(bytes(int(code != REMOVED) for code in range(256)))
+        self.ids = array('q', compress(self.ids, keep))
+        self.usernames = list(compress(self.usernames, keep))
+        self.emails = list(compress(self.emails, keep))
+        self.statuses = bytearray(compress(self.statuses, keep))
+        self._rows = None
+        self._removed = 0
@@ -0,0 +1,128 @@
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class RWLock:
+    # Блокировка читателей-писателей для потоков одного процесса. Читатели
+    # работают параллельно, писатель - один. Ждущий писатель не пропускает
+    # новых читателей, иначе при постоянном чтении он бы не дождался.
+    # Повторный захват тем же потоком не блокирует: писатель может снова
+    # взять запись или чтение, читатель - снова чтение. Захват записи
+    # потоком, который держит только чтение, привёл бы к взаимоблокировке,
+    # поэтому это ошибка
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def acquire_read(self) -> None:
+        local = self._local
+        if getattr(local, "reads", 0):
+            local.reads += 1
+            return
+
+        me = threading.get_ident()
+        with self._cond:
+            # Под записью своего же потока читателем не считаемся
+            local.counted = self._writer != me
+            if local.counted:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+        local.reads = 1
+
+    def holds_read(self) -> bool:
+        # Держит ли текущий поток блокировку чтения (в том числе вложенно)
+        return getattr(self._local, "reads", 0) > 0
+
+    def release_read(self) -> None:
+        local = self._local
+        local.reads -= 1
+        if local.reads or not local.counted:
+            return
+
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+
+            if getattr(self._local, "reads", 0) and self._local.counted:
+                raise RuntimeError("нельзя захватить запись, удерживая чтение")
+
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class FileLock:
+    # Рекомендательная блокировка fcntl.flock на отдельном файле (рядом со
+    # снимком) - между процессами. Вложенные захваты только считаются:
+    # повторный flock на том же файле сменил бы режим блокировки. Счётчик
+    # общий для потоков, поэтому захватывать её нужно под RWLock.write()
+    def __init__(self, path: Path):
+        if fcntl is None:
+            raise RuntimeError("блокировка файлов доступна только на Unix (нужен fcntl)")
+        self.path = Path(path)
+        self._file: Optional[BinaryIO] = None
+        self._depth = 0
+
+    @contextmanager
+    def locked(self, shared: bool = False) -> Iterator[None]:
+        if not self._depth:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'ab')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                # Закрытие файла снимает flock
+                self._file.close()
+                self._file = None
@@ -0,0 +1,409 @@
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+from user import User
+
+# Сколько символов читать за раз при потоковом разборе
+READ_CHUNK = 1 << 16
+
+# Начало записи, как её пишет write_atomic: user_id - первый ключ объекта.
+# Внутри строк кавычки экранированы, поэтому ложных совпадений нет
+RECORD_START = re.compile(rb'\{\s*"user_id":\s*(-?\d+)')
+
+
+def _tmp_path(path: Path) -> Path:
+    # Своё имя у каждого процесса и потока, чтобы одновременные записи не
+    # подменяли чужой временный файл
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def encode_user(user: User) -> bytes:
+    # Запись в том же виде, в каком её пишет json.dump(..., indent=2) внутри
+    # массива: переводы строк в значениях экранированы, поэтому сдвиг по
+    # "\n" затрагивает только разметку
+    text = json.dumps(user.to_dict(), indent=2, ensure_ascii=False)
+    return text.replace("\n", "\n  ").encode('utf-8')
+
+
+def write_atomic(path: Path, users: Union['LazyUsers', Iterable[User]], fsync: bool = False) -> None:
+    # Пишем во временный файл рядом и подменяем им исходный: при падении
+    # на диске остаётся либо старый, либо новый файл целиком. Ещё не
+    # прочитанные записи LazyUsers копируются из старого снимка как есть
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _tmp_path(path)
+
+    if isinstance(users, LazyUsers):
+        with open(tmp_path, 'wb') as f:
+            separator = b"[\n  "
+            for record in users.records():
+                f.write(separator)
+                f.write(record)
+                separator = b",\n  "
+            f.write(b"[]" if separator == b"[\n  " else b"\n]")
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([user.to_dict() for user in users], f, indent=2, ensure_ascii=False)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def read_meta(path: Path) -> Dict[str, int]:
+    # Рядом со снимком (users.json.meta) лежат счётчик id, чтобы id
+    # удалённых пользователей не выдавались повторно, и номер поколения:
+    # каждый commit увеличивает его на 1. По (inode, mtime, размер) изменения
+    # не видны: inode при os.replace переиспользуется, а две записи одного
+    # размера укладываются в один тик mtime
+    meta = {"next_id": 1, "generation": 0}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            meta.update(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return meta
+
+
+def write_meta(path: Path, next_id: int, generation: int, fsync: bool = False) -> None:
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"next_id": next_id, "generation": generation}, f)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def bump_generation(path: Path, next_id: int, fsync: bool = False) -> None:
+    # Поколение увеличивается до записи данных: читатель, увидевший новое
+    # поколение, ждёт на flock, пока писатель не закончит. Упавший между
+    # ними писатель приведёт лишь к лишнему перечитыванию
+    write_meta(path, next_id, read_meta(path)["generation"] + 1, fsync)
+
+
+def iter_records(f) -> Iterator[dict]:
+    # Разбирает JSON массив объектов по одному, не держа в памяти весь
+    # список: читаем кусками и отдаём каждый объект, как только он дочитан
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_CHUNK).lstrip()
+    if not buf.startswith("["):
+        raise json.JSONDecodeError("ожидался массив", buf, 0)
+    pos = 1
+    eof = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+
+        if pos < len(buf) and buf[pos] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Объект не дочитан: добавляем кусок и пробуем снова
+            if eof:
+                raise
+            chunk = f.read(READ_CHUNK)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+
+        yield record
+        pos = end
+
+
+def read_snapshot(path: Path, lazy: bool = False) -> MutableMapping:
+    if lazy:
+        users = LazyUsers.open(path)
+        if users is not None:
+            return users
+
+    users = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for user_data in iter_records(f):
+                user = User.from_dict(user_data)
+                users[user.user_id] = user
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return users
+
+
+def _count(data: mmap.mmap, pattern: bytes, chunk: int = 1 << 24) -> int:
+    # bytes.count по кускам mmap без копии всего файла; куски перекрываются
+    # на len(pattern) - 1 байт, чтобы не потерять вхождения на границе
+    count = 0
+    for start in range(0, len(data), chunk):
+        count += data[start:start + chunk + len(pattern) - 1].count(pattern)
+    return count
+
+
+class LazyUsers(MutableMapping):
+    # id -> User, где вместо ещё не прочитанных пользователей хранится
+    # смещение их записи в файле снимка. Запись разбирается при первом
+    # обращении. Файл держится открытым: write_atomic подменяет снимок
+    # через os.replace, а открытый дескриптор продолжает видеть старый
+    # файл, к которому относятся смещения
+    def __init__(self, f: BinaryIO, items: Dict[int, Union[User, int]], starts: array):
+        self._file = f
+        self._items = items
+        # Начала всех записей файла по возрастанию и размер файла в конце:
+        # запись кончается перед началом следующей
+        self._starts = starts
+
+    @classmethod
+    def open(cls, path: Path) -> Optional['LazyUsers']:
+        # Смещения ищем регулярным выражением по mmap, не разбирая JSON.
+        # Если файл записан не write_atomic (user_id не первый ключ), число
+        # совпадений разойдётся с числом ключей user_id - тогда None, и
+        # вызывающий читает файл целиком
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offsets = {int(m.group(1)): m.start() for m in RECORD_START.finditer(data)}
+            if len(offsets) != _count(data, b'"user_id":'):
+                f.close()
+                return None
+            # finditer идёт по файлу, поэтому смещения уже по возрастанию
+            starts = array('q', offsets.values())
+            starts.append(len(data))
+
+        return cls(f, offsets, starts)
+
+    def _record(self, offset: int) -> bytes:
+        # Байты записи от "{" до "}" без разделителя ",\n  " или "\n]" за ней.
+        # pread не двигает общую позицию файла: читатели под общей
+        # блокировкой чтения разбирают записи параллельно
+        end = self._starts[bisect_left(self._starts, offset) + 1]
+        chunk = os.pread(self._file.fileno(), end - offset, offset)
+        return chunk.rstrip(b" \t\r\n,]")
+
+    def _hydrate(self, user_id: int, offset: int) -> User:
+        user = User.from_dict(json.loads(self._record(offset)))
+        self._items[user_id] = user
+        return user
+
+    def __getitem__(self, user_id: int) -> User:
+        item = self._items[user_id]
+        if isinstance(item, int):
+            return self._hydrate(user_id, item)
+        return item
+
+    def __setitem__(self, user_id: int, user: User) -> None:
+        self._items[user_id] = user
+
+    def __delitem__(self, user_id: int) -> None:
+        del self._items[user_id]
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._items
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def records(self) -> Iterator[bytes]:
+        # Записи для write_atomic: непрочитанные пользователи не разбираются,
+        # их байты копируются из старого снимка
+        for item in self._items.values():
+            yield self._record(item) if isinstance(item, int) else encode_user(item)
+
+    def snapshot(self) -> 'LazyUsers':
+        # Копия для фоновой записи снимка: словарь свой, файл общий. Закрывает
+        # файл только исходный объект
+        return LazyUsers(self._file, dict(self._items), self._starts)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _snapshot(users: MutableMapping) -> Union[LazyUsers, List[User]]:
+    # Что передать в write_atomic: LazyUsers без разбора записей, словарь -
+    # списком пользователей
+    if isinstance(users, LazyUsers):
+        return users.snapshot()
+    return list(users.values())
+
+
+class JsonStorage:
+    # Весь список пользователей в одном JSON файле, переписывается целиком.
+    # При lazy=True load читает только смещения записей (LazyUsers)
+    def __init__(self, filename: str = "users.json", fsync: bool = False, lazy: bool = False):
+        self.filename = Path(filename)
+        self.meta_path = self.filename.with_name(self.filename.name + ".meta")
+        self.fsync = fsync
+        self.lazy = lazy
+
+    def load(self) -> MutableMapping:
+        return read_snapshot(self.filename, self.lazy)
+
+    def load_next_id(self) -> int:
+        return read_meta(self.meta_path)["next_id"]
+
+    def generation(self) -> int:
+        return read_meta(self.meta_path)["generation"]
+
+    def record(self, user: User, deleted: bool = False) -> None:
+        pass
+
+    def commit(self, users: MutableMapping, next_id: int) -> None:
+        bump_generation(self.meta_path, next_id, self.fsync)
+        write_atomic(self.filename, _snapshot(users), self.fsync)
+
+    def close(self) -> None:
+        pass
+
+
+class JournalStorage:
+    # Снимок в формате JsonStorage плюс журнал изменений в JSON lines рядом
+    # с ним (users.json.log). Каждое изменение - одна дописанная строка:
+    #   {"op": "put", "user": {...}}  или  {"op": "delete", "user_id": 5}
+    # Записи идемпотентны (последняя запись по id побеждает), поэтому
+    # повторное применение журнала поверх более нового снимка безопасно.
+    #
+    # Когда журнал вырастает больше compact_bytes, он переименовывается в
+    # users.json.log.old, новые записи идут в свежий журнал, а снимок
+    # пишется в фоновом потоке; после записи снимка .old удаляется. Если
+    # процесс упал посреди уплотнения, load применит снимок, .old и журнал
+    # по порядку и получит то же состояние
+    def __init__(
+        self,
+        filename: str = "users.json",
+        compact_bytes: int = 1 << 20,
+        fsync: bool = False,
+        lazy: bool = False,
+    ):
+        self.filename = Path(filename)
+        self.log_path = self.filename.with_name(self.filename.name + ".log")
+        self.old_log_path = self.filename.with_name(self.filename.name + ".log.old")
+        self.meta_path = self.filename.with_name(self.filename.name + ".meta")
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        self.lazy = lazy
+        # Фоновое уплотнение нельзя, если файлы делят несколько процессов:
+        # снимок, дописанный после снятия блокировки, затёр бы чужие
+        # изменения. UserManager(concurrent=True) выключает его
+        self.background_compaction = True
+        self._lines: List[str] = []
+        self._compactor: Optional[threading.Thread] = None
+
+    def load(self) -> MutableMapping:
+        self.wait_compaction()
+        users = read_snapshot(self.filename, self.lazy)
+        for path in (self.old_log_path, self.log_path):
+            self._replay(path, users)
+        return users
+
+    def load_next_id(self) -> int:
+        return read_meta(self.meta_path)["next_id"]
+
+    def generation(self) -> int:
+        return read_meta(self.meta_path)["generation"]
+
+    def _replay(self, path: Path, users: MutableMapping) -> None:
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return
+
+        with f:
+            offset = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("строка журнала не дописана")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная при падении последняя строка: отрезаем её,
+                    # иначе следующая запись склеится с ней в одну строку
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+
+                if entry["op"] == "put":
+                    user = User.from_dict(entry["user"])
+                    users[user.user_id] = user
+                else:
+                    users.pop(entry["user_id"], None)
+
+    def record(self, user: User, deleted: bool = False) -> None:
+        if deleted:
+            entry = {"op": "delete", "user_id": user.user_id}
+        else:
+            entry = {"op": "put", "user": user.to_dict()}
+        self._lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def commit(self, users: MutableMapping, next_id: int) -> None:
+        bump_generation(self.meta_path, next_id, self.fsync)
+        if self._lines:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write("".join(self._lines))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._lines = []
+
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if self.log_path.exists() and self.log_path.stat().st_size > self.compact_bytes:
+            self.compact(users, self.background_compaction)
+
+    def compact(self, users: MutableMapping, background: bool = True) -> None:
+        self.wait_compaction()
+        if self.old_log_path.exists():
+            # .old остался от упавшего процесса, и переименование журнала
+            # затёрло бы его. users уже включает оба журнала, поэтому снимок
+            # пишем сразу, а журналы удаляем
+            write_atomic(self.filename, _snapshot(users), self.fsync)
+            self.old_log_path.unlink()
+            self.log_path.unlink(missing_ok=True)
+            return
+
+        if self.log_path.exists():
+            os.replace(self.log_path, self.old_log_path)
+
+        # Список берём сейчас: словарь users продолжит меняться
+        snapshot = _snapshot(users)
+        if background:
+            self._compactor = threading.Thread(target=self._write_snapshot, args=(snapshot,))
+            self._compactor.start()
+        else:
+            self._write_snapshot(snapshot)
+
+    def _write_snapshot(self, snapshot: Union[LazyUsers, List[User]]) -> None:
+        write_atomic(self.filename, snapshot, self.fsync)
+        self.old_log_path.unlink(missing_ok=True)
+
+    def wait_compaction(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self) -> None:
+        self.wait_compaction()
+
+
+Storage = Union[JsonStorage, JournalStorage]
@@ -0,0 +1,181 @@
+import argparse
+import random
+import tempfile
+import threading
+import time
+from multiprocessing import Process
+from pathlib import Path
+
+from storage import JournalStorage, JsonStorage
+from user import UserStatus
+from user_manager import UserManager
+
+STORAGES = {"json": JsonStorage, "journal": JournalStorage}
+
+
+def open_manager(path, storage, concurrent):
+    return UserManager(storage=STORAGES[storage](path), concurrent=concurrent)
+
+
+def process_worker(path, storage, concurrent, worker, count):
+    manager = open_manager(path, storage, concurrent)
+    for i in range(count):
+        user = manager.create_user(f"p{worker}-{i}", f"p{worker}-{i}@mail.ru")
+        # Чтение между записями заставляет перечитывать чужие изменения
+        manager.get_by_id(user.user_id)
+    manager.close()
+
+
+def check(manager, expected_names):
+    users = manager.get_all()
+    ids = [user.user_id for user in users]
+    names = {user.username for user in users}
+    lost = len(expected_names - names)
+    duplicates = len(ids) - len(set(ids))
+    return len(users), lost, duplicates
+
+
+def run_processes(storage, concurrent, processes, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "users.json"
+        workers = [
+            Process(target=process_worker, args=(path, storage, concurrent, w, count))
+            for w in range(processes)
+        ]
+
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+
+        expected = {f"p{w}-{i}" for w in range(processes) for i in range(count)}
+        total, lost, duplicates = check(open_manager(path, storage, False), expected)
+
+    mode = "с блокировками" if concurrent else "без блокировок"
+    print(
+        f"процессы {storage:<8} {mode:<15} пользователей {total:>6} из {len(expected):>6}, "
+        f"потеряно {lost:>6}, повторных id {duplicates}, {seconds:.2f} с"
+    )
+    return lost == 0 and duplicates == 0
+
+
+def run_threads(storage, threads, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = open_manager(Path(tmp) / "users.json", storage, True)
+        errors = []
+
+        def writer(worker):
+            try:
+                for i in range(count):
+                    manager.create_user(f"t{worker}-{i}", f"t{worker}-{i}@mail.ru")
+                    if i % 10 == 0:
+                        manager.update_user(manager.get_by_username(f"t{worker}-{i}").user_id,
+                                            status=UserStatus.INACTIVE)
+            except Exception as error:
+                errors.append(error)
+
+        def reader():
+            try:
+                while any(t.is_alive() for t in writers):
+                    # Пользователи по статусам не должны теряться и дублироваться
+                    active = manager.get_by_status(UserStatus.ACTIVE)
+                    inactive = manager.get_by_status(UserStatus.INACTIVE)
+                    assert len(active) + len(inactive) <= threads * count
+            except Exception as error:
+                errors.append(error)
+
+        writers = [threading.Thread(target=writer, args=(w,)) for w in range(threads)]
+        readers = [threading.Thread(target=reader) for _ in range(threads)]
+
+        start = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers + readers:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        expected = {f"t{w}-{i}" for w in range(threads) for i in range(count)}
+        total, lost, duplicates = check(manager, expected)
+        reopened, _, _ = check(open_manager(Path(tmp) / "users.json", storage, False), expected)
+        inactive = len(manager.get_by_status(UserStatus.INACTIVE))
+
+    print(
+        f"потоки   {storage:<8} {'с блокировками':<15} пользователей {total:>6} из "
+        f"{len(expected):>6}, потеряно {lost:>6}, повторных id {duplicates}, "
+        f"в файле {reopened}, неактивных {inactive}, ошибок {len(errors)}, {seconds:.2f} с"
+    )
+    return not errors and lost == 0 and duplicates == 0 and reopened == len(expected)
+
+
+def run_lazy_readers(threads, count):
+    # Параллельное чтение ленивого снимка: каждый поток должен получить
+    # ровно того пользователя, которого просил
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "users.json"
+        writer = open_manager(path, "json", False)
+        writer.create_users((f"l{i}", f"l{i}@mail.ru") for i in range(count))
+        writer.close()
+
+        manager = UserManager(storage=JsonStorage(path, lazy=True), concurrent=True)
+        wrong = []
+        errors = []
+
+        def reader(seed):
+            ids = list(range(1, count + 1))
+            random.Random(seed).shuffle(ids)
+            try:
+                for user_id in ids:
+                    user = manager.get_by_id(user_id)
+                    if user.user_id != user_id:
+                        wrong.append((user_id, user.user_id))
+            except Exception as error:
+                errors.append(error)
+
+        readers = [threading.Thread(target=reader, args=(seed,)) for seed in range(threads)]
+        start = time.perf_counter()
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        # Запись после чтения не должна размножить или потерять пользователей
+        manager.create_user("после", "after@mail.ru")
+        manager.close()
+        expected = {f"l{i}" for i in range(count)} | {"после"}
+        total, lost, duplicates = check(open_manager(path, "json", False), expected)
+
+    print(
+        f"ленивое  json     {'с блокировками':<15} пользователей {total:>6} из "
+        f"{len(expected):>6}, потеряно {lost:>6}, повторных id {duplicates}, "
+        f"чужих пользователей {len(wrong)}, ошибок {len(errors)}, {seconds:.2f} с"
+    )
+    return not wrong and not errors and lost == 0 and duplicates == 0 and total == len(expected)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка concurrent режима")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200, help="пользователей на воркер")
+    parser.add_argument("--lazy-users", type=int, default=50_000)
+    parser.add_argument("--storages", nargs="+", choices=list(STORAGES), default=list(STORAGES))
+    args = parser.parse_args(argv)
+
+    ok = True
+    for storage in args.storages:
+        # Без блокировок процессы затирают файлы друг друга: это ожидаемо
+        run_processes(storage, False, args.processes, args.users)
+        ok &= run_processes(storage, True, args.processes, args.users)
+        ok &= run_threads(storage, args.threads, args.users)
+
+    ok &= run_lazy_readers(max(args.threads, 8), args.lazy_users)
+
+    print("OK" if ok else "ОБНАРУЖЕНЫ ПОТЕРИ")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from storage import JournalStorage, JsonStorage, LazyUsers
+from user import User, UserStatus
+from user_manager import UserManager
+
+
+def state(manager):
+    return sorted((user.to_dict() for user in manager.get_all()), key=lambda d: d["user_id"])
+
+
+def check_indexes(manager):
+    # Поиск по индексам должен совпадать с перебором всех пользователей
+    users = manager.get_all()
+    for status in UserStatus:
+        expected = {user.user_id for user in users if user.status == status}
+        assert {user.user_id for user in manager.get_by_status(status)} == expected
+    for user in users:
+        assert manager.get_by_username(user.username) is user
+        assert manager.get_by_email(user.email) is user
+
+
+tmp = Path(tempfile.mkdtemp())
+
+# Тест индексов после добавления, изменения и удаления
+manager = UserManager(storage=JsonStorage(tmp / "index.json"))
+manager.create_users((f"user{i}", f"user{i}@mail.ru") for i in range(20))
+manager.add_user(User(100, "added", "added@mail.ru", UserStatus.BANNED))
+manager.update_user(3, username="renamed", status=UserStatus.INACTIVE)
+manager.update_user(4, email="new4@mail.ru")
+manager.delete_by_id(5)
+manager.delete_by_status(UserStatus.BANNED)
+check_indexes(manager)
+# id выдаются с 1: у user2 id 3, у user3 - id 4
+assert manager.get_by_username("user1") is not None
+assert manager.get_by_username("user2") is None
+assert manager.get_by_email("user3@mail.ru") is None
+assert manager.get_by_id(5) is None and manager.get_by_id(100) is None
+
+# Неудачное изменение не должно портить индексы
+try:
+    manager.update_user(6, status="banned")
+except ValueError:
+    pass
+else:
+    raise AssertionError("update_user принял статус-строку")
+assert manager.get_by_id(6).status == UserStatus.ACTIVE
+check_indexes(manager)
+manager.close()
+
+# Тест восстановления из журнала: снимок не пишется, всё в users.json.log
+path = tmp / "journal.json"
+manager = UserManager(storage=JournalStorage(path))
+manager.create_users((f"j{i}", f"j{i}@mail.ru") for i in range(10))
+manager.update_user(2, username="переименован\n", status=UserStatus.BANNED)
+manager.delete_by_id(7)
+expected = state(manager)
+manager.close()
+
+assert not path.exists()
+reopened = UserManager(storage=JournalStorage(path))
+assert state(reopened) == expected
+check_indexes(reopened)
+reopened.close()
+
+# Тест недописанной строки журнала: её отрезают, и следующая запись ложится
+# с новой строки
+log_path = path.with_name(path.name + ".log")
+log_size = log_path.stat().st_size
+with open(log_path, "ab") as f:
+    f.write(b'{"op": "put", "user": {"user_id": 50, "usern')
+
+reopened = UserManager(storage=JournalStorage(path))
+assert state(reopened) == expected
+assert log_path.stat().st_size == log_size
+reopened.create_user("после обрыва", "torn@mail.ru")
+expected = state(reopened)
+reopened.close()
+
+with open(log_path, "rb") as f:
+    for line in f:
+        json.loads(line)
+assert state(UserManager(storage=JournalStorage(path))) == expected
+
+# Тест восстановления после падения во время уплотнения: журнал уже
+# переименован в .log.old, а снимок не записан. После перезапуска изменения
+# дописываются в новый журнал, оба журнала читаются по порядку
+old_log_path = path.with_name(path.name + ".log.old")
+log_path.rename(old_log_path)
+
+manager = UserManager(storage=JournalStorage(path))
+assert state(manager) == expected
+manager.update_user(1, email="after-crash@mail.ru")
+manager.delete_by_id(3)
+expected = state(manager)
+manager.close()
+
+assert old_log_path.exists() and log_path.exists()
+assert state(UserManager(storage=JournalStorage(path))) == expected
+
+# Уплотнение с оставшимся .log.old пишет снимок и удаляет оба журнала
+storage = JournalStorage(path, compact_bytes=0)
+storage.background_compaction = False
+manager = UserManager(storage=storage)
+manager.create_user("уплотнение", "compact@mail.ru")
+expected = state(manager)
+manager.close()
+
+assert path.exists() and not old_log_path.exists()
+assert state(UserManager(storage=JournalStorage(path))) == expected
+
+# Тест ленивой загрузки: те же изменения над ленивым и обычным снимком
+# дают одинаковые файлы, а непрочитанные записи переносятся как есть
+users = [
+    User(i, f"lazy{i} \"ё\"\n", f"lazy{i}@mail.ru", list(UserStatus)[i % 3])
+    for i in range(1, 1001)
+]
+for name in ("eager.json", "lazy.json"):
+    writer = UserManager(storage=JsonStorage(tmp / name))
+    with writer.batch():
+        for user in users:
+            writer.add_user(User.from_dict(user.to_dict()))
+    writer.close()
+
+eager = UserManager(storage=JsonStorage(tmp / "eager.json"))
+lazy = UserManager(storage=JsonStorage(tmp / "lazy.json", lazy=True))
+assert isinstance(lazy.users, LazyUsers)
+assert lazy.count_users() == eager.count_users() == len(users)
+assert lazy.get_by_id(500) == eager.get_by_id(500) == users[499]
+
+for each in (eager, lazy):
+    each.update_user(10, username="lazy10-renamed")
+    each.delete_by_id(11)
+    each.create_user("новый", "new@mail.ru")
+assert state(lazy) == state(eager)
+lazy_file = lazy.users._file
+eager.close()
+lazy.close()
+
+assert lazy_file.closed
+assert (tmp / "lazy.json").read_bytes() == (tmp / "eager.json").read_bytes()
+assert state(UserManager(storage=JsonStorage(tmp / "lazy.json", lazy=True))) == state(
+    UserManager(storage=JsonStorage(tmp / "eager.json"))
+)
+
+# Ленивый журнал: уплотнение переносит непрочитанные записи снимка
+path = tmp / "lazy.json"
+storage = JournalStorage(path, compact_bytes=0, lazy=True)
+storage.background_compaction = False
+manager = UserManager(storage=storage)
+manager.update_user(12, status=UserStatus.BANNED)
+expected = state(manager)
+manager.close()
+
+assert not path.with_name(path.name + ".log").exists()
+assert state(UserManager(storage=JournalStorage(path, lazy=True))) == expected
+
+# Тест поколений: две записи одного размера в один тик mtime (inode при
+# os.replace может вернуться прежний) другой процесс всё равно видит
+path = tmp / "generation.json"
+first = UserManager(storage=JsonStorage(path), concurrent=True)
+first.create_users((f"g{i}", f"g{i}@mail.ru") for i in range(5))
+second = UserManager(storage=JsonStorage(path), concurrent=True)
+assert second.get_by_id(1).status == UserStatus.ACTIVE
+
+files = (path, path.with_name(path.name + ".meta"))
+stats = [os.stat(file) for file in files]
+first.update_user(1, status=UserStatus.BANNED)
+first.update_user(2, status=UserStatus.BANNED)
+for file, st in zip(files, stats):
+    os.utime(file, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+assert second.get_by_id(1).status == UserStatus.BANNED
+second.update_user(3, username="g3-renamed")
+assert state(UserManager(storage=JsonStorage(path))) == state(second)
+assert second.get_by_id(2).status == UserStatus.BANNED
+first.close()
+second.close()
+
+shutil.rmtree(tmp)
+print("OK")
@@ -10,7 +10,14 @@ class UserStatus(Enum):
     DELETED = "deleted"
 
 
-@dataclass
+# Строка из JSON -> единственный экземпляр статуса. Поиск в dict быстрее
+# вызова UserStatus(value), а все пользователи ссылаются на одни объекты
+STATUS_BY_VALUE = {status.value: status for status in UserStatus}
+
+
+# slots=True: у экземпляров нет __dict__, это около 40 байт на пользователе
+# (см. benchmark.py)
+@dataclass(slots=True)
 class User:
     user_id: int
     username: str
@@ -34,5 +41,6 @@ class User:
             user_id=data["user_id"],
             username=data["username"],
             email=data["email"],
-            status=UserStatus(data["status"])
+            # Неизвестное значение уходит в UserStatus, который бросит ValueError
+            status=STATUS_BY_VALUE.get(data["status"]) or UserStatus(data["status"])
         )
\ No newline at end of file
@@ -1,79 +1,293 @@
-import json
-from dataclasses import asdict
-from pathlib import Path
-from typing import Dict, List, Optional, Any
+import atexit
+import functools
+from contextlib import contextmanager
+from dataclasses import asdict, fields
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional, Sequence, Any
+from locks import FileLock, RWLock
+from storage import JsonStorage, LazyUsers, Storage
 from user import User, UserStatus
 
 
-class UserManager:
-    def __init__(self, filename: str = "users.json"):
-        self.filename = Path(filename)
-        self.users: Dict[int, User] = {}
-        self.load_users()
+# Атрибуты, индексы по которым строятся сразу; по остальным - при первом
+# вызове get_by_attribute
+INDEXED_ATTRIBUTES = ("username", "email", "status")
 
-    def save_users(self) -> None:
-        users_list = [user.to_dict() for user in self.users.values()]
+# Поля, которые можно менять через update_user
+UPDATABLE_FIELDS = tuple(f.name for f in fields(User) if f.name != "user_id")
 
-        self.filename.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(users_list, f, indent=2, ensure_ascii=False)
+def _reading(method):
+    # В режиме concurrent чтение идёт под RWLock.read() после проверки,
+    # не изменили ли файлы другие процессы
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._rwlock is None:
+            return method(self, *args, **kwargs)
+
+        self._refresh_if_changed()
+        with self._rwlock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writing(method):
+    # В режиме concurrent изменение - это batch: блокировки, перечитывание
+    # файла и одна запись на диск при выходе
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._rwlock is None:
+            return method(self, *args, **kwargs)
+
+        with self.batch():
+            return method(self, *args, **kwargs)
+    return wrapper
 
-    def load_users(self) -> None:
-        try:
-            if not self.filename.exists():
-                return
 
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                users_list = json.load(f)
+class UserManager:
+    def __init__(
+        self,
+        filename: str = "users.json",
+        write_behind: bool = False,
+        max_pending: int = 1000,
+        storage: Optional[Storage] = None,
+        concurrent: bool = False,
+    ):
+        # По умолчанию - один JSON файл; JournalStorage дописывает изменения
+        # в журнал, и одно изменение стоит O(1) записи вместо всего файла.
+        # Если storage передан, filename берётся из него
+        self.storage = storage if storage is not None else JsonStorage(filename)
+        self.filename = self.storage.filename
+        self.users: MutableMapping[int, User] = {}
+        # В режиме write_behind изменения копятся в памяти и пишутся на диск
+        # одним save_users после max_pending изменений, при flush/close или
+        # при выходе из программы
+        self.write_behind = write_behind
+        self.max_pending = max_pending
+        self._pending = 0
+        self._batch_depth = 0
+        # атрибут -> значение -> {id: пользователь}. Вложенный dict работает
+        # как упорядоченное множество: удаление за O(1) и порядок добавления
+        self._indexes: Dict[str, Dict[Any, Dict[int, User]]] = {}
+
+        # concurrent=True: потоки разделяет RWLock, процессы - flock на
+        # users.json.lock. Каждое изменение идёт под исключительной
+        # блокировкой: перечитать файл, если его изменил другой процесс,
+        # применить изменение, записать (write_atomic подменяет файл через
+        # rename). Чтение перечитывает файл, только если поменялось
+        # поколение в users.json.meta, которое увеличивает каждый commit
+        self._rwlock: Optional[RWLock] = None
+        self._file_lock: Optional[FileLock] = None
+        self._generation: Optional[int] = None
+        if concurrent:
+            if write_behind:
+                raise ValueError("write_behind нельзя совмещать с concurrent")
+            self._rwlock = RWLock()
+            self._file_lock = FileLock(self.filename.with_name(self.filename.name + ".lock"))
+            if hasattr(self.storage, "background_compaction"):
+                self.storage.background_compaction = False
+            with self._rwlock.write(), self._file_lock.locked(shared=True):
+                self.load_users()
+        else:
+            self.load_users()
+
+        if write_behind:
+            atexit.register(self.flush)
+
+    def __enter__(self) -> 'UserManager':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self.storage.close()
+        # Ленивый снимок держит открытым файл, из которого читает записи
+        if isinstance(self.users, LazyUsers):
+            self.users.close()
+        if self.write_behind:
+            atexit.unregister(self.flush)
+
+    @contextmanager
+    def batch(self) -> Iterator['UserManager']:
+        # Все изменения внутри блока сохраняются одной записью файла при
+        # выходе из самого внешнего batch, в том числе при исключении:
+        # в памяти изменения уже применены
+        if self._rwlock is None:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and (
+                    not self.write_behind or self._pending >= self.max_pending
+                ):
+                    self.flush()
+            return
+
+        # Блокировки держатся весь batch, так что другие потоки и процессы
+        # видят его изменения целиком
+        with self._rwlock.write(), self._file_lock.locked():
+            if self._batch_depth == 0:
+                self._refresh()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def _refresh(self) -> None:
+        if self.storage.generation() != self._generation:
+            self.load_users()
+
+    def _refresh_if_changed(self) -> None:
+        # Проверка без блокировки оптимистична: если файлы не менялись, чтение
+        # обходится разбором маленького .meta. Внутри другого чтения
+        # (print_all вызывает get_all) перечитывать нельзя: запись под своим
+        # же чтением - взаимоблокировка, а внешний вызов уже видит
+        # согласованные данные
+        if self._rwlock.holds_read():
+            return
+        if self.storage.generation() == self._generation:
+            return
+        with self._rwlock.write(), self._file_lock.locked(shared=True):
+            self._refresh()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.save_users()
+
+    def _changed(self, user: User, deleted: bool = False) -> None:
+        self.storage.record(user, deleted)
+        self._pending += 1
+        if self._batch_depth:
+            return
+        if self.write_behind and self._pending < self.max_pending:
+            return
+        self.save_users()
+
+    def save_users(self) -> None:
+        self.storage.commit(self.users, self._next_id)
+        self._pending = 0
+        if self._rwlock is not None:
+            self._generation = self.storage.generation()
+
+    def load_users(self) -> None:
+        old_users = self.users
+        self.users = self.storage.load()
+        # load дождался фоновой записи снимка, поэтому старый файл больше
+        # никому не нужен
+        if isinstance(old_users, LazyUsers):
+            old_users.close()
+        # Счётчик из файла не меньше max(id) + 1, если только файл не
+        # правили руками; max по ключам - один проход при загрузке
+        self._next_id = max(self.storage.load_next_id(), max(self.users, default=0) + 1)
+        self.rebuild_indexes()
+        if self._rwlock is not None:
+            self._generation = self.storage.generation()
+
+    def rebuild_indexes(self) -> None:
+        self._indexes = {}
+        if self.storage.lazy:
+            # Построение индекса читает всех пользователей, поэтому в ленивом
+            # режиме индексы строятся при первом поиске по атрибуту
+            return
+
+        self._indexes = {attribute: {} for attribute in INDEXED_ATTRIBUTES}
+        for user in self.users.values():
+            self._index_user(user)
 
-            self.users = {}
-            for user_data in users_list:
-                user = User.from_dict(user_data)
-                self.users[user.user_id] = user
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.users = {}
+    def _index(self, attribute: str) -> Dict[Any, Dict[int, User]]:
+        index = self._indexes.get(attribute)
+        if index is None:
+            index = self._build_index(attribute)
+        return index
 
+    def _build_index(self, attribute: str) -> Dict[Any, Dict[int, User]]:
+        index: Dict[Any, Dict[int, User]] = {}
+        for user in self.users.values():
+            if hasattr(user, attribute):
+                index.setdefault(getattr(user, attribute), {})[user.user_id] = user
+        self._indexes[attribute] = index
+        return index
 
+    def _index_user(self, user: User) -> None:
+        for attribute, index in self._indexes.items():
+            if hasattr(user, attribute):
+                index.setdefault(getattr(user, attribute), {})[user.user_id] = user
+
+    def _unindex_user(self, user: User) -> None:
+        for attribute, index in self._indexes.items():
+            if not hasattr(user, attribute):
+                continue
+            value = getattr(user, attribute)
+            bucket = index.get(value)
+            if bucket is None:
+                continue
+            bucket.pop(user.user_id, None)
+            if not bucket:
+                del index[value]
+
+
+    @_reading
     def get_by_id(self, user_id: int) -> Optional[User]:
         return self.users.get(user_id)
 
+    @_reading
     def get_by_username(self, username: str) -> Optional[User]:
-        for user in self.users.values():
-            if user.username == username:
-                return user
+        # Имена не обязаны быть уникальными: возвращаем первого добавленного
+        bucket = self._index("username").get(username)
+        if bucket:
+            return next(iter(bucket.values()))
+        return None
+
+    @_reading
+    def get_by_email(self, email: str) -> Optional[User]:
+        bucket = self._index("email").get(email)
+        if bucket:
+            return next(iter(bucket.values()))
         return None
 
+    @_reading
     def get_by_status(self, status: UserStatus) -> List[User]:
-        return [user for user in self.users.values() if user.status == status]
+        return list(self._index("status").get(status, {}).values())
 
+    @_reading
     def get_by_attribute(self, attribute: str, value: Any) -> List[User]:
-        result = []
-        for user in self.users.values():
-            if hasattr(user, attribute):
-                attr_value = getattr(user, attribute)
-                if attr_value == value:
-                    result.append(user)
-        return result
-
+        index = self._index(attribute)
+        try:
+            return list(index.get(value, {}).values())
+        except TypeError:
+            # Нехешируемое значение (например, список) не может совпасть с
+            # ключом индекса, но может быть равно значению атрибута
+            return [
+                user for user in self.users.values()
+                if hasattr(user, attribute) and getattr(user, attribute) == value
+            ]
+
+    @_reading
     def get_all(self) -> List[User]:
         return list(self.users.values())
 
 
+    @_writing
     def add_user(self, user: User) -> bool:
         if user.user_id in self.users:
             return False  # User with this ID already exists
 
         self.users[user.user_id] = user
-        self.save_users()
+        self._next_id = max(self._next_id, user.user_id + 1)
+        self._index_user(user)
+        self._changed(user)
         return True
 
+    @_writing
     def create_user(self, username: str, email: str, status: UserStatus = UserStatus.ACTIVE) -> User:
-        # Generate new ID
-        new_id = max(self.users.keys()) + 1 if self.users else 1
-
+        # id выдаются по возрастанию и не повторяются, даже после удаления
         user = User(
-            user_id=new_id,
+            user_id=self._next_id,
             username=username,
             email=email,
             status=status
@@ -82,44 +296,97 @@ class UserManager:
         self.add_user(user)
         return user
 
+    @_writing
+    def create_users(self, users: Iterable[Sequence[Any]]) -> List[User]:
+        # users - кортежи (имя, email) или (имя, email, статус). Все
+        # пользователи получают идущие подряд id и сохраняются одной записью
+        created = []
+        with self.batch():
+            for row in users:
+                created.append(self.create_user(*row))
+        return created
+
+
+    @_writing
+    def update_user(self, user_id: int, **changes: Any) -> Optional[User]:
+        # Поля меняются только через менеджер, иначе индексы устареют
+        if "user_id" in changes:
+            raise ValueError("user_id нельзя изменить")
+        unknown = [attribute for attribute in changes if attribute not in UPDATABLE_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"неизвестные поля: {', '.join(unknown)}; можно менять: "
+                f"{', '.join(UPDATABLE_FIELDS)}"
+            )
+        if "status" in changes and not isinstance(changes["status"], UserStatus):
+            raise ValueError("status должен быть UserStatus")
+
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+
+        previous = {attribute: getattr(user, attribute) for attribute in changes}
+        self._unindex_user(user)
+        try:
+            for attribute, value in changes.items():
+                setattr(user, attribute, value)
+        except Exception:
+            # Пользователь не должен выпасть из индексов наполовину изменённым
+            for attribute, value in previous.items():
+                setattr(user, attribute, value)
+            raise
+        finally:
+            self._index_user(user)
+
+        self._changed(user)
+        return user
 
+    @_writing
     def delete_by_id(self, user_id: int) -> bool:
         if user_id in self.users:
-            del self.users[user_id]
-            self.save_users()
+            user = self.users.pop(user_id)
+            self._unindex_user(user)
+            self._changed(user, deleted=True)
             return True
         return False
 
+    @_writing
     def delete_by_username(self, username: str) -> bool:
         user = self.get_by_username(username)
         if user:
             return self.delete_by_id(user.user_id)
         return False
 
+    @_writing
     def delete_by_status(self, status: UserStatus) -> int:
         users_to_delete = self.get_by_status(status)
         count = 0
 
-        for user in users_to_delete:
-            if self.delete_by_id(user.user_id):
-                count += 1
+        with self.batch():
+            for user in users_to_delete:
+                if self.delete_by_id(user.user_id):
+                    count += 1
 
         return count
 
+    @_writing
     def delete_by_attribute(self, attribute: str, value: Any) -> int:
         users_to_delete = self.get_by_attribute(attribute, value)
         count = 0
 
-        for user in users_to_delete:
-            if self.delete_by_id(user.user_id):
-                count += 1
+        with self.batch():
+            for user in users_to_delete:
+                if self.delete_by_id(user.user_id):
+                    count += 1
 
         return count
 
 
+    @_reading
     def count_users(self) -> int:
         return len(self.users)
 
+    @_reading
     def print_all(self) -> None:
         print("\nВСЕ ПОЛЬЗОВАТЕЛИ")
         for user in self.get_all():